@@ -0,0 +1,45 @@
+"""Per-request cost of the shared auth check (user_from_authorization) with a
+cold vs warm token cache.
+
+    python benchmarks/auth_overhead.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.auth_utils as auth_utils
+from utils.dependencies import clear_token_cache, user_from_authorization
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    header = "Bearer " + auth_utils.create_access_token({"sub": "bench@example.com"})
+
+    def uncached():
+        clear_token_cache()
+        user_from_authorization(header)
+
+    user_from_authorization(header)
+    cached_us = per_call_us(lambda: user_from_authorization(header), args.iterations)
+    uncached_us = per_call_us(uncached, args.iterations)
+
+    print(f"decode + verify every request: {uncached_us:8.2f} us/request")
+    print(f"verified-token cache hit:      {cached_us:8.2f} us/request")
+    print(f"speedup:                       {uncached_us / cached_us:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""End-to-end check of GET /events/feed.
+
+Starts ``serve.py`` on a scratch database (MONGO_DB_NAME, default
+event_planner_feed), opens the feed for an organizer and an invitee, then
+invites, RSVPs and deletes through the API and checks each connection
+receives the expected delta, reporting how long each one took to arrive.
+
+--mode changestream needs MONGO_URL to point at a replica set; a local
+single-node one is enough:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    python benchmarks/change_feed_check.py --mode changestream --workers 2
+
+--mode poll works against a standalone mongod. With more than one worker the
+two connections and the writes usually land on different workers, which is
+the case the shared change stream has to cover.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MONGO_DB_NAME", "event_planner_feed")
+
+import httpx
+
+SERVER = [sys.executable, os.path.join(ROOT, "serve.py")]
+ORGANIZER = "feed-organizer@example.com"
+INVITEE = "feed-invitee@example.com"
+PASSWORD = "feed-check-password"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, workers, port):
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "EVENT_FEED_MODE": mode,
+        "EVENT_FEED_POLL_INTERVAL": os.getenv("EVENT_FEED_POLL_INTERVAL", "1"),
+        "RATE_LIMIT_BACKEND": "off",
+    }
+    process = subprocess.Popen(SERVER, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).status_code == 200:
+                time.sleep(1 + workers * 0.2)
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("serve.py did not become ready within 60s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _headers(email):
+    from utils.auth_utils import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+class FeedReader(threading.Thread):
+    """Reads one SSE connection and queues (arrival time, event, data)."""
+
+    def __init__(self, base_url, email):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.email = email
+        self.messages = queue.Queue()
+        self.ready = threading.Event()
+        self.mode = None
+
+    def run(self):
+        try:
+            self._read()
+        except httpx.HTTPError:
+            # The server closes open feeds when it stops.
+            pass
+
+    def _read(self):
+        timeout = httpx.Timeout(30, read=None)
+        with httpx.stream("GET", f"{self.base_url}/events/feed", headers=_headers(self.email), timeout=timeout) as response:
+            response.raise_for_status()
+            event, data = None, []
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    payload = json.loads("\n".join(data))
+                    if event == "ready":
+                        self.mode = payload["mode"]
+                        self.ready.set()
+                    else:
+                        self.messages.put((time.perf_counter(), event, payload))
+                    event, data = None, []
+
+    def expect(self, delta_type, event_id, timeout):
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise AssertionError(f"{self.email} got no {delta_type} for event {event_id} within {timeout}s")
+            try:
+                arrived, event, payload = self.messages.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if event == delta_type and payload.get("event_id") == event_id:
+                return arrived
+
+
+def run_check(base_url, timeout):
+    with httpx.Client(base_url=base_url, timeout=30) as http:
+        for email in (ORGANIZER, INVITEE):
+            # 400 when the user exists from an earlier run.
+            http.post("/auth/signup", json={"email": email, "password": PASSWORD})
+
+        readers = [FeedReader(base_url, ORGANIZER), FeedReader(base_url, INVITEE)]
+        for reader in readers:
+            reader.start()
+            if not reader.ready.wait(timeout):
+                raise AssertionError(f"feed for {reader.email} did not open")
+        organizer, invitee = readers
+
+        results = {"mode": organizer.mode}
+        created = http.post("/events/create", headers=_headers(ORGANIZER), json={
+            "title": "Feed check", "description": "change feed check",
+            "date": "2025-06-01", "time": "18:00", "location": "Bench"
+        })
+        created.raise_for_status()
+        event_id = created.json()["event_id"]
+
+        started = time.perf_counter()
+        http.post("/events/invite", headers=_headers(ORGANIZER),
+                  json={"event_id": str(event_id), "email": INVITEE}).raise_for_status()
+        results["invited"] = invitee.expect("invited", event_id, timeout) - started
+
+        started = time.perf_counter()
+        http.post(f"/events/{event_id}/respond", headers=_headers(INVITEE),
+                  json={"response": "Going"}).raise_for_status()
+        results["rsvp_changed"] = organizer.expect("rsvp_changed", event_id, timeout) - started
+
+        started = time.perf_counter()
+        http.delete(f"/events/{event_id}", headers=_headers(ORGANIZER)).raise_for_status()
+        results["event_deleted"] = invitee.expect("event_deleted", event_id, timeout) - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", default="changestream", choices=["auto", "changestream", "poll"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for each delta")
+    args = parser.parse_args()
+
+    port = _free_port()
+    process = start_server(args.mode, args.workers, port)
+    try:
+        results = run_check(f"http://127.0.0.1:{port}", args.timeout)
+    finally:
+        stop_server(process)
+
+    print(f"mode={results.pop('mode')} workers={args.workers}")
+    for delta_type, seconds in results.items():
+        print(f"{delta_type:<14} delivered after {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Multi-process uniqueness check and throughput of block event-ID allocation
+vs one $inc per ID. Needs a running mongod (MONGO_URL); uses a scratch database.
+
+    python benchmarks/id_allocation.py --processes 8 --ids 5000 --block-size 1000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+
+from utils.id_allocator import BlockIdAllocator
+
+load_dotenv()
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://127.0.0.1:27017")
+DB_NAME = "event_planner_bench"
+COUNTER_ID = "bench_event_id"
+
+
+async def _allocate(count, concurrency, block_size):
+    counters = AsyncIOMotorClient(MONGO_URL)[DB_NAME]["counters"]
+
+    if block_size:
+        allocator = BlockIdAllocator(COUNTER_ID, block_size)
+
+        async def next_id():
+            return await allocator.next_id(counters)
+    else:
+        async def next_id():
+            counter = await counters.find_one_and_update(
+                {"_id": COUNTER_ID}, {"$inc": {"sequence_value": 1}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return counter["sequence_value"]
+
+    ids = []
+
+    async def worker(share):
+        for _ in range(share):
+            ids.append(await next_id())
+
+    shares = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+    await asyncio.gather(*(worker(share) for share in shares))
+    return ids
+
+
+def _process(args):
+    count, concurrency, block_size = args
+    return asyncio.run(_allocate(count, concurrency, block_size))
+
+
+async def _reset():
+    client = AsyncIOMotorClient(MONGO_URL)
+    await client[DB_NAME]["counters"].delete_one({"_id": COUNTER_ID})
+    client.close()
+
+
+def run(label, processes, ids_per_process, concurrency, block_size):
+    asyncio.run(_reset())
+    started = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_process, [(ids_per_process, concurrency, block_size)] * processes)
+    elapsed = time.perf_counter() - started
+
+    all_ids = [i for ids in results for i in ids]
+    duplicates = len(all_ids) - len(set(all_ids))
+    assert duplicates == 0, f"{label}: {duplicates} duplicate IDs"
+    assert min(all_ids) >= 1, f"{label}: non-positive ID allocated"
+    print(f"{label:<28} {len(all_ids):>8} unique IDs in {elapsed:6.2f}s  ({len(all_ids) / elapsed:10.0f} IDs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ids", type=int, default=5000, help="IDs per process")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent allocations per process")
+    parser.add_argument("--block-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    run("one $inc per ID", args.processes, args.ids, args.concurrency, 0)
+    run(f"blocks of {args.block_size}", args.processes, args.ids, args.concurrency, args.block_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""End-to-end load test of the API with a JSON report for comparing runs.
+
+Seeds a scratch database (MONGO_DB_NAME, default event_planner_load) with
+synthetic users, events and attendees, then drives a weighted mix of login,
+create, invite, respond, listing and search requests with a concurrent client
+and reports p50/p95/p99 latency, throughput and Mongo commands per request
+for each endpoint.
+
+By default the app runs in-process behind httpx's ASGI transport against
+MONGO_URL. --stand-in swaps Motor for mongomock_motor (if installed) for a
+quick run without a mongod: its latencies say nothing about production,
+it emits no command events (Mongo ops are reported as null), and it can't run
+the search aggregation.
+--base-url drives an already running server instead; seed the same database
+it uses.
+
+    python benchmarks/load_test.py --users 2000 --events 10000 --max-attendees 5000 \\
+        --requests 20000 --concurrency 100 --output run.json
+    python benchmarks/load_test.py --reuse --requests 20000 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_DB_NAME", "event_planner_load")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Measure capacity, not the rate limiter: every request comes from one client.
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+os.environ.setdefault("CONCURRENCY_LIMITS", "default=0,search=0,attendees=0,login=0")
+
+import httpx
+
+PASSWORD = "load-test-password"
+RESPONSES = ("Going", "Maybe", "Not Going")
+SEED_BATCH = 1000
+
+# Share of requests per scenario; --mix overrides, e.g. --mix search=50,me=50
+DEFAULT_MIX = {
+    "login": 2, "create": 5, "invite": 5, "respond": 15,
+    "me": 25, "my_events": 10, "invited": 10, "search": 28,
+}
+
+# Route template each scenario is charged to in mongo_commands_per_request.
+ROUTES = {
+    "login": "/auth/login",
+    "create": "/events/create",
+    "invite": "/events/invite",
+    "respond": "/events/{event_id}/respond",
+    "me": "/events/me",
+    "my_events": "/events/my-events",
+    "invited": "/events/invited",
+    "search": "/events/search",
+}
+
+SEARCH_WORDS = ("party", "meeting", "review", "launch", "workshop", "dinner", "demo", "summit")
+
+
+def _email(i):
+    return f"user{i}@loadtest.example.com"
+
+
+async def seed(users, events, mean_attendees, max_attendees, seed_value):
+    """Write users, events and memberships straight to Mongo. Returns the state the scenarios draw from."""
+    import database
+    from config import get_settings
+    from utils.auth_utils import hash_password
+    from utils.response_counts import NO_RESPONSE, RESPONSE_KEYS
+
+    rng = random.Random(seed_value)
+    db = database.db
+    for name in ("users", "events", "event_attendees", "counters"):
+        await db[name].drop()
+    await database.ensure_indexes()
+
+    password_hash = hash_password(PASSWORD)
+    for start in range(0, users, SEED_BATCH):
+        await db.users.insert_many([
+            {"email": _email(i), "password": password_hash}
+            for i in range(start, min(users, start + SEED_BATCH))
+        ])
+
+    embedded = get_settings().attendee_storage == "embedded"
+    base = datetime(2025, 1, 1)
+    memberships = []
+    event_docs, attendee_docs = [], []
+
+    async def flush():
+        if event_docs:
+            await db.events.insert_many(event_docs)
+            event_docs.clear()
+        if attendee_docs:
+            await db.event_attendees.insert_many(attendee_docs)
+            attendee_docs.clear()
+
+    for event_id in range(1, events + 1):
+        organizer = rng.randrange(users)
+        size = min(max_attendees, users - 1, int(rng.expovariate(1 / max(mean_attendees, 1))))
+        invited = rng.sample(range(users), size + 1)
+        entries = [{"email": _email(organizer), "role": "organizer"}]
+        counts = {key: 0 for key in RESPONSE_KEYS}
+        counts[NO_RESPONSE] = 1
+        for i in invited:
+            if i == organizer or len(entries) > size:
+                continue
+            entry = {"email": _email(i), "role": "attendee"}
+            if rng.random() < 0.5:
+                entry["response"] = rng.choice(RESPONSES)
+            counts[entry.get("response", NO_RESPONSE)] += 1
+            entries.append(entry)
+            if len(memberships) < 100000:
+                memberships.append((event_id, entry["email"]))
+
+        starts_at = base + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        doc = {
+            "_id": event_id,
+            "title": f"{rng.choice(SEARCH_WORDS)} {rng.choice(SEARCH_WORDS)} {event_id}",
+            "description": " ".join(rng.choice(SEARCH_WORDS) for _ in range(8)),
+            "date": starts_at.strftime("%Y-%m-%d"),
+            "time": starts_at.strftime("%H:%M"),
+            "starts_at": starts_at,
+            "timezone": "UTC",
+            "location": "Load test",
+            "organizer": _email(organizer),
+            "response_counts": counts,
+            "version": 1,
+            "created_at": datetime.utcnow(),
+        }
+        if embedded:
+            doc["attendees"] = entries
+        else:
+            attendee_docs.extend({"event_id": event_id, **entry} for entry in entries)
+        event_docs.append(doc)
+        if len(event_docs) >= SEED_BATCH or len(attendee_docs) >= SEED_BATCH * 10:
+            await flush()
+    await flush()
+
+    await db.counters.insert_one({"_id": "event_id", "sequence_value": events})
+    return {"users": users, "events": events, "memberships": memberships}
+
+
+async def load_state(users, seed_value):
+    """Rebuild scenario state from an existing seed (--reuse)."""
+    import database
+    from config import get_settings
+
+    rng = random.Random(seed_value)
+    events = await database.db.events.count_documents({})
+    users = await database.db.users.count_documents({}) or users
+    memberships = []
+    if get_settings().attendee_storage == "embedded":
+        cursor = database.db.events.aggregate([
+            {"$sample": {"size": 2000}},
+            {"$project": {"attendees": {"$slice": ["$attendees", 1, 50]}}}
+        ])
+        async for ev in cursor:
+            memberships += [(ev["_id"], a["email"]) for a in ev.get("attendees", [])]
+    else:
+        cursor = database.db.event_attendees.aggregate([
+            {"$match": {"role": "attendee"}}, {"$sample": {"size": 100000}}
+        ])
+        memberships = [(m["event_id"], m["email"]) async for m in cursor]
+    rng.shuffle(memberships)
+    return {"users": users, "events": events, "memberships": memberships}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+_METRIC_LINE = re.compile(r'^mongo_commands_per_request_(sum|count)\{route="([^"]*)"\} (\S+)$')
+
+
+async def mongo_commands_by_route(http):
+    """(sum, count) of mongo_commands_per_request per route from /metrics."""
+    totals = {}
+    response = await http.get("/metrics")
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            kind, route, value = match.groups()
+            entry = totals.setdefault(route, [0.0, 0.0])
+            entry[0 if kind == "sum" else 1] = float(value)
+    return totals
+
+
+class Scenarios:
+    def __init__(self, state, rng):
+        from utils.auth_utils import create_access_token
+
+        self.state = state
+        self.rng = rng
+        self.tokens = {}
+        self._create_access_token = create_access_token
+        self.created = []
+
+    def _auth(self, email):
+        token = self.tokens.get(email)
+        if token is None:
+            token = self.tokens[email] = self._create_access_token({"sub": email})
+        return {"Authorization": f"Bearer {token}"}
+
+    def _user(self):
+        return _email(self.rng.randrange(self.state["users"]))
+
+    def _member(self):
+        if not self.state["memberships"]:
+            return 1, self._user()
+        return self.rng.choice(self.state["memberships"])
+
+    async def login(self, http):
+        return await http.post("/auth/login", json={"email": self._user(), "password": PASSWORD})
+
+    async def create(self, http):
+        email = self._user()
+        day = datetime(2025, 1, 1) + timedelta(days=self.rng.randrange(365))
+        response = await http.post("/events/create", headers=self._auth(email), json={
+            "title": f"{self.rng.choice(SEARCH_WORDS)} created", "description": "created by load test",
+            "date": day.strftime("%Y-%m-%d"), "time": "18:00", "location": "Load test"
+        })
+        if response.status_code == 200 and len(self.created) < 10000:
+            self.created.append((response.json()["event_id"], email))
+        return response
+
+    async def invite(self, http):
+        if not self.created:
+            return await self.create(http)
+        event_id, organizer = self.rng.choice(self.created)
+        return await http.post("/events/invite", headers=self._auth(organizer),
+                               json={"event_id": str(event_id), "email": self._user()})
+
+    async def respond(self, http):
+        event_id, email = self._member()
+        return await http.post(f"/events/{event_id}/respond", headers=self._auth(email),
+                               json={"response": self.rng.choice(RESPONSES)})
+
+    async def me(self, http):
+        return await http.get("/events/me", headers=self._auth(self._member()[1]),
+                              params={"limit": 50, "fields": "summary"})
+
+    async def my_events(self, http):
+        return await http.get("/events/my-events", headers=self._auth(self._user()), params={"limit": 50})
+
+    async def invited(self, http):
+        return await http.get("/events/invited", headers=self._auth(self._member()[1]),
+                              params={"limit": 50, "fields": "summary"})
+
+    async def search(self, http):
+        params = {"keyword": self.rng.choice(SEARCH_WORDS), "limit": 20, "fields": "summary"}
+        if self.rng.random() < 0.5:
+            month = self.rng.randrange(1, 12)
+            params.update(start_date=f"2025-{month:02d}-01", end_date=f"2025-{month + 1:02d}-01")
+        return await http.get("/events/search", headers=self._auth(self._member()[1]), params=params)
+
+
+async def drive(http, scenarios, mix, total, concurrency, rng):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = rng.choices(names, weights=weights, k=total)
+    results = {name: {"latencies": [], "statuses": {}, "errors": 0} for name in names}
+    queue = iter(plan)
+
+    async def worker():
+        for name in queue:
+            started = time.perf_counter()
+            try:
+                response = await getattr(scenarios, name)(http)
+                status = response.status_code
+            except Exception:
+                status = "exception"
+            elapsed = time.perf_counter() - started
+            result = results[name]
+            result["latencies"].append(elapsed)
+            result["statuses"][str(status)] = result["statuses"].get(str(status), 0) + 1
+            if status == "exception" or status >= 500:
+                result["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def build_report(config, results, elapsed, before, after):
+    endpoints = {}
+    for name, result in results.items():
+        latencies = sorted(result["latencies"])
+        if not latencies:
+            continue
+        route = ROUTES[name]
+        commands, counted = (a - b for a, b in zip(after.get(route, (0, 0)), before.get(route, (0, 0))))
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": result["errors"],
+            "statuses": result["statuses"],
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+            "mongo_ops_per_request": round(commands / counted, 2) if counted and not config["stand_in"] else None,
+        }
+    total = sum(len(r["latencies"]) for r in results.values())
+    return {
+        "config": config,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Endpoints whose p95 or Mongo ops per request grew by more than ``tolerance``."""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p95_ms", "mongo_ops_per_request"):
+            old, new = previous.get(metric), current.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append({"endpoint": name, "metric": metric, "baseline": old, "current": new})
+    return regressions
+
+
+def _parse_mix(text):
+    if not text:
+        return DEFAULT_MIX
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def main_async(args):
+    if args.stand_in:
+        import mongomock_motor
+        import database
+
+        # mongomock has no $text support.
+        os.environ.setdefault("SEARCH_BACKEND", "memory")
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient()
+
+    import database
+    from config import get_settings
+
+    await database.connect_to_mongo()
+    rng = random.Random(args.seed)
+    try:
+        if args.reuse:
+            state = await load_state(args.users, args.seed)
+        else:
+            seeding_started = time.perf_counter()
+            state = await seed(args.users, args.events, args.mean_attendees, args.max_attendees, args.seed)
+            print(f"Seeded {args.users} users / {args.events} events in "
+                  f"{time.perf_counter() - seeding_started:.1f}s", file=sys.stderr)
+    finally:
+        if args.base_url:
+            database.close_mongo_connection()
+
+    scenarios = Scenarios(state, rng)
+    mix = _parse_mix(args.mix)
+    config = {
+        "requests": args.requests, "concurrency": args.concurrency, "mix": mix,
+        "users": state["users"], "events": state["events"],
+        "max_attendees": args.max_attendees, "mean_attendees": args.mean_attendees,
+        "attendee_storage": get_settings().attendee_storage, "target": args.base_url or "in-process",
+        "stand_in": bool(args.stand_in),
+    }
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits)
+        app_context = None
+    else:
+        import main
+
+        # connect_to_mongo already ran, so the lifespan reuses this client.
+        app_context = main.lifespan(main.app)
+        await app_context.__aenter__()
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load", timeout=60)
+
+    try:
+        before = await mongo_commands_by_route(http)
+        results, elapsed = await drive(http, scenarios, mix, args.requests, args.concurrency, rng)
+        after = await mongo_commands_by_route(http)
+    finally:
+        await http.aclose()
+        if app_context is not None:
+            await app_context.__aexit__(None, None, None)
+
+    return build_report(config, results, elapsed, before, after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=1000, help="1k to 1M")
+    parser.add_argument("--mean-attendees", type=int, default=20)
+    parser.add_argument("--max-attendees", type=int, default=1000, help="up to 50k (needs at least as many users)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", help="scenario weights, e.g. search=50,me=30,respond=20")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding and use the existing data")
+    parser.add_argument("--stand-in", action="store_true", help="use mongomock_motor instead of MONGO_URL")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="baseline report; exit 1 if p95 or Mongo ops regress")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 20%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Check that concurrent RSVPs to one event are neither lost nor double-counted.
+
+Creates an event on a scratch database (MONGO_DB_NAME, default
+event_planner_rsvp) with --attendees invitees, then:
+
+1. every attendee RSVPs once, all at the same time: each attendee's stored
+   response must be the one they sent;
+2. every attendee sends --repeats different RSVPs at the same time: each
+   stored response must be one of them, and in both phases the event's
+   response_counts (what summary_only serves) must match a recount of the
+   attendee list.
+
+With --legacy the event's counters are removed halfway through the invites,
+as for an event created before they existed, so the remaining invites and
+the RSVPs have to rebuild them.
+
+Exits 1 on any mismatch or failed request. By default the app runs in-process
+behind httpx's ASGI transport against MONGO_URL; --stand-in uses
+mongomock_motor instead, --base-url drives a running server (e.g. serve.py
+with several workers) that uses the same database.
+
+    python benchmarks/rsvp_concurrency.py --attendees 500 --repeats 4
+    python benchmarks/rsvp_concurrency.py --stand-in --legacy
+    ATTENDEE_STORAGE=collection python benchmarks/rsvp_concurrency.py --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_DB_NAME", "event_planner_rsvp")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Every request comes from one client; don't let the rate limiter reject them.
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+os.environ.setdefault("CONCURRENCY_LIMITS", "default=0,search=0,attendees=0,login=0")
+
+import httpx
+
+RESPONSES = ("Going", "Maybe", "Not Going")
+ORGANIZER = "organizer@rsvp.example.com"
+
+
+def _email(i):
+    return f"attendee{i}@rsvp.example.com"
+
+
+def _auth(email):
+    from utils.auth_utils import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+async def seed_users(count):
+    """Register the organizer and attendees straight in Mongo; invites only check that users exist."""
+    import database
+
+    await database.users_collection.delete_many({"email": {"$regex": "@rsvp\\.example\\.com$"}})
+    await database.users_collection.insert_many(
+        [{"email": ORGANIZER, "password": "-"}] + [{"email": _email(i), "password": "-"} for i in range(count)]
+    )
+
+
+async def drop_counters(event_id):
+    """Make the event look like one created before response_counts existed."""
+    import database
+
+    await database.events_collection.update_one(
+        {"_id": int(event_id)}, {"$unset": {"response_counts": "", "version": ""}}
+    )
+
+
+async def invite(http, event_id, emails):
+    for start in range(0, len(emails), 1000):
+        invited = await http.post("/events/invite/bulk", headers=_auth(ORGANIZER),
+                                  json={"event_id": event_id, "emails": emails[start:start + 1000]})
+        invited.raise_for_status()
+
+
+async def create_event(http, count, legacy):
+    created = await http.post("/events/create", headers=_auth(ORGANIZER), json={
+        "title": "RSVP concurrency", "description": "rsvp concurrency check",
+        "date": "2025-06-01", "time": "18:00", "location": "Bench"
+    })
+    created.raise_for_status()
+    event_id = str(created.json()["event_id"])
+    emails = [_email(i) for i in range(count)]
+    if legacy:
+        await invite(http, event_id, emails[:count // 2])
+        await drop_counters(event_id)
+        emails = emails[count // 2:]
+    await invite(http, event_id, emails)
+    return event_id
+
+
+async def respond_all(http, event_id, choices):
+    """Send every (email, response) at once; returns the number of failed requests."""
+    async def respond(email, response):
+        result = await http.post(f"/events/{event_id}/respond", headers=_auth(email), json={"response": response})
+        return result.status_code == 200
+
+    results = await asyncio.gather(*(respond(email, response) for email, response in choices))
+    return results.count(False)
+
+
+async def verify(http, event_id, allowed):
+    """Compare stored responses with what each attendee may have ended on, and counters with a recount."""
+    headers = _auth(ORGANIZER)
+    full = (await http.get(f"/events/{event_id}/attendees", headers=headers)).json()
+    summary = (await http.get(f"/events/{event_id}/attendees", headers=headers,
+                              params={"summary_only": True})).json()
+    problems = []
+    for attendee in full["attendees"]:
+        if attendee["role"] == "organizer":
+            continue
+        if attendee["response"] not in allowed[attendee["email"]]:
+            problems.append(f"{attendee['email']} ended on {attendee['response']!r}, "
+                            f"expected one of {sorted(allowed[attendee['email']])}")
+    if summary["response_summary"] != full["response_summary"]:
+        problems.append(f"counters {summary['response_summary']} != recount {full['response_summary']}")
+    return problems
+
+
+async def run(http, args):
+    rng = random.Random(args.seed)
+    event_id = await create_event(http, args.attendees, args.legacy)
+    emails = [_email(i) for i in range(args.attendees)]
+    failures = 0
+    problems = await verify(http, event_id, {email: {None, "No Response"} for email in emails})
+
+    first = {email: rng.choice(RESPONSES) for email in emails}
+    started = time.perf_counter()
+    failures += await respond_all(http, event_id, list(first.items()))
+    print(f"phase 1: {len(first)} RSVPs in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    problems += await verify(http, event_id, {email: {response} for email, response in first.items()})
+
+    racing = {email: [rng.choice(RESPONSES) for _ in range(args.repeats)] for email in emails}
+    choices = [(email, response) for email, responses in racing.items() for response in responses]
+    rng.shuffle(choices)
+    started = time.perf_counter()
+    failures += await respond_all(http, event_id, choices)
+    print(f"phase 2: {len(choices)} RSVPs in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    problems += await verify(http, event_id, {email: set(responses) for email, responses in racing.items()})
+
+    if failures:
+        problems.append(f"{failures} RSVP requests failed")
+    return problems
+
+
+async def main_async(args):
+    if args.stand_in:
+        import mongomock_motor
+        import database
+
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient()
+
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        await seed_users(args.attendees)
+    finally:
+        # --legacy edits the event directly, so keep the connection for it.
+        if args.base_url and not args.legacy:
+            database.close_mongo_connection()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits)
+        app_context = None
+    else:
+        import main
+
+        # connect_to_mongo already ran, so the lifespan reuses this client.
+        app_context = main.lifespan(main.app)
+        await app_context.__aenter__()
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://rsvp", timeout=60)
+
+    try:
+        return await run(http, args)
+    finally:
+        await http.aclose()
+        if app_context is not None:
+            await app_context.__aexit__(None, None, None)
+        elif args.legacy:
+            database.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attendees", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=4, help="concurrent RSVPs per attendee in phase 2")
+    parser.add_argument("--concurrency", type=int, default=100, help="connections to --base-url")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stand-in", action="store_true", help="use mongomock_motor instead of MONGO_URL")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--legacy", action="store_true", help="drop the event's counters halfway through the invites")
+    args = parser.parse_args()
+
+    problems = asyncio.run(main_async(args))
+    for problem in problems[:20]:
+        print(problem)
+    if len(problems) > 20:
+        print(f"... and {len(problems) - 20} more")
+    print("FAIL" if problems else "OK: no lost or double-counted RSVPs")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
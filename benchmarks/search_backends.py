@@ -0,0 +1,138 @@
+"""Compare keyword search backends: $regex scan vs $text index vs in-process inverted index.
+
+Seeds a scratch database with synthetic events (1M by default, which takes a
+while the first time; pass --reuse to skip seeding on later runs).
+
+    python benchmarks/search_backends.py --events 1000000 --queries 50
+
+The first three timings are the keyword lookup alone. --route also times the
+whole GET /events/search route (auth, query building, the Mongo round trip
+and serialization) for each SEARCH_BACKEND, through the in-process app; for
+memory that includes sending the matched ids back to Mongo.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+os.environ.setdefault("CONCURRENCY_LIMITS", "default=0,search=0,attendees=0,login=0")
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import TEXT
+
+from utils.search_index import InvertedIndex
+
+load_dotenv()
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://127.0.0.1:27017")
+DB_NAME = "event_planner_bench"
+
+WORDS = ("team party meeting budget review launch planning workshop dinner offsite "
+         "hackathon retro demo roadmap onboarding training social summit kickoff sync").split()
+
+
+def _phrase(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+async def seed(events, count):
+    rng = random.Random(42)
+    await events.drop()
+    batch = []
+    for event_id in range(1, count + 1):
+        batch.append({
+            "_id": event_id,
+            "title": _phrase(rng, 3) + f" {event_id}",
+            "description": _phrase(rng, 12),
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+        if len(batch) == 10000:
+            await events.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await events.insert_many(batch, ordered=False)
+    await events.create_index([("title", TEXT), ("description", TEXT)], weights={"title": 3, "description": 1})
+
+
+async def timed(label, queries, run):
+    started = time.perf_counter()
+    hits = 0
+    for keyword in queries:
+        hits += await run(keyword)
+    elapsed = (time.perf_counter() - started) / len(queries) * 1000
+    print(f"{label:14s} {elapsed:10.2f} ms/query  ({hits / len(queries):.0f} hits/query)")
+
+
+async def main(args):
+    events = AsyncIOMotorClient(MONGO_URL)[DB_NAME]["events"]
+    if not args.reuse:
+        await seed(events, args.events)
+
+    rng = random.Random(7)
+    queries = [rng.choice(WORDS) for _ in range(args.queries)]
+
+    async def regex(keyword):
+        pattern = {"$regex": re.escape(keyword), "$options": "i"}
+        return len(await events.find(
+            {"$or": [{"title": pattern}, {"description": pattern}]}, {"_id": 1}
+        ).limit(args.limit).to_list(length=None))
+
+    async def text(keyword):
+        return len(await events.find(
+            {"$text": {"$search": keyword}}, {"_id": 1, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(args.limit).to_list(length=None))
+
+    started = time.perf_counter()
+    index = InvertedIndex()
+    await index.rebuild(events)
+    print(f"in-process index built in {time.perf_counter() - started:.1f}s")
+
+    async def memory(keyword):
+        scores = index.search(keyword)
+        return len(sorted(scores, key=scores.get, reverse=True)[:args.limit])
+
+    await timed("regex", queries, regex)
+    await timed("text", queries, text)
+    await timed("memory", queries, memory)
+
+    if args.route:
+        await route_timings(queries, args.limit)
+
+
+async def route_timings(queries, limit):
+    import httpx
+
+    import main
+    from config import get_settings
+    from utils.auth_utils import create_access_token
+
+    os.environ["MONGO_DB_NAME"] = DB_NAME
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+    for backend in ("regex", "text", "memory"):
+        os.environ["SEARCH_BACKEND"] = backend
+        get_settings.cache_clear()
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+                async def route(keyword):
+                    found = await http.get("/events/search", headers=headers, params={"keyword": keyword, "limit": limit})
+                    found.raise_for_status()
+                    return found.json()["count"]
+
+                await timed(f"{backend} route", queries, route)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--reuse", action="store_true", help="Use the already seeded database")
+    parser.add_argument("--route", action="store_true", help="Also time the whole /events/search route per backend")
+    asyncio.run(main(parser.parse_args()))
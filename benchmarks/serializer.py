@@ -0,0 +1,110 @@
+"""Serialize + encode cost for events with large attendee lists: the previous
+per-router serializer with json/jsonable_encoder vs utils.serializers with orjson.
+
+    python benchmarks/serializer.py --events 20 --attendees 10000 --rounds 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from utils.serializers import dumps, serialize_event
+
+VIEWER = "viewer@example.com"
+
+
+def legacy_serialize(event_doc, user_email):
+    # The _serialize_event that event_routes and search_routes each had.
+    event_copy = {**event_doc}
+    event_copy["id"] = event_copy.pop("_id")
+
+    user_role = "attendee"
+    user_response = None
+    if event_copy.get("organizer") == user_email:
+        user_role = "organizer"
+    else:
+        for attendee in event_copy.get("attendees", []):
+            if attendee.get("email") == user_email:
+                user_role = attendee.get("role", "attendee")
+                user_response = attendee.get("response")
+                break
+
+    event_copy["user_role"] = user_role
+    event_copy["is_organizer"] = event_copy.get("organizer") == user_email
+    event_copy["user_response"] = user_response
+
+    if event_copy.get("attendees"):
+        for attendee in event_copy["attendees"]:
+            if attendee.get("email") == user_email:
+                attendee["my_response"] = attendee.get("response")
+                break
+    return event_copy
+
+
+def make_events(count, attendees):
+    now = datetime.utcnow()
+    events = []
+    for event_id in range(1, count + 1):
+        entries = [{"email": "organizer@example.com", "role": "organizer"}]
+        entries += [
+            {"email": f"user{i}@example.com", "role": "attendee", "response": "Going", "response_updated_at": now}
+            for i in range(attendees - 2)
+        ]
+        # Worst case for a linear scan: the viewer is last.
+        entries.append({"email": VIEWER, "role": "attendee", "response": "Maybe", "response_updated_at": now})
+        events.append({
+            "_id": event_id, "title": f"Event {event_id}", "description": "Benchmark event",
+            "date": "2025-06-01", "time": "18:00", "starts_at": now, "timezone": "UTC",
+            "location": "HQ", "organizer": "organizer@example.com", "version": 1,
+            "response_counts": {"Going": attendees - 2, "Maybe": 1, "Not Going": 0, "No Response": 1},
+            "created_at": now, "attendees": entries,
+        })
+    return events
+
+
+def best_of(rounds, fn):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--attendees", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.attendees)
+
+    def legacy():
+        return json.dumps(jsonable_encoder([legacy_serialize(ev, VIEWER) for ev in events])).encode()
+
+    def shared():
+        return dumps([serialize_event(ev, VIEWER) for ev in events])
+
+    def shared_summary():
+        return dumps([serialize_event(ev, VIEWER, "summary") for ev in events])
+
+    assert json.loads(legacy()) == json.loads(shared()), "serializers disagree"
+
+    print(f"{args.events} events x {args.attendees} attendees, best of {args.rounds}")
+    legacy_s = best_of(args.rounds, legacy)
+    shared_s = best_of(args.rounds, shared)
+    summary_s = best_of(args.rounds, shared_summary)
+    print(f"legacy serializer + jsonable_encoder/json: {legacy_s * 1000:9.1f} ms")
+    print(f"shared serializer + orjson:                {shared_s * 1000:9.1f} ms  ({legacy_s / shared_s:.1f}x)")
+    print(f"shared serializer, fields=summary:         {summary_s * 1000:9.1f} ms  ({legacy_s / summary_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
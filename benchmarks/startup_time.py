@@ -0,0 +1,138 @@
+"""Cold-start cost of a worker: import time, startup (lifespan) time and the
+latency of the first vs second request to a few endpoints.
+
+Each run is a fresh interpreter, so nothing is cached between runs. The app
+is driven in-process through httpx's ASGI transport against MONGO_URL on a
+scratch database (MONGO_DB_NAME, default event_planner_startup);
+--stand-in uses mongomock_motor instead, which is enough to compare import
+and first-request overhead but says nothing about connection setup.
+
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --runs 5 --stand-in --importtime 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "startup-password"
+
+# (label, method, path, needs a token); the first request to each is measured against the second.
+REQUESTS = (
+    ("metrics", "GET", "/metrics", False),
+    ("my_events", "GET", "/events/my-events", True),
+    ("signup", "POST", "/auth/signup", False),
+    ("login", "POST", "/auth/login", False),
+)
+
+
+async def _child_requests(app, lifespan, timings):
+    import httpx
+
+    from utils.auth_utils import create_access_token
+
+    started = time.perf_counter()
+    async with lifespan(app):
+        timings["startup_ms"] = (time.perf_counter() - started) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as http:
+            for label, method, path, needs_token in REQUESTS:
+                for attempt in ("first", "second"):
+                    email = f"startup-{os.getpid()}-{attempt}@example.com"
+                    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"} if needs_token else {}
+                    body = {"email": email, "password": PASSWORD} if method == "POST" else None
+                    started = time.perf_counter()
+                    response = await http.request(method, path, headers=headers, json=body)
+                    timings[f"{label}_{attempt}_ms"] = (time.perf_counter() - started) * 1000
+                    if response.status_code >= 400:
+                        raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text}")
+
+
+def child(stand_in):
+    started = time.perf_counter()
+    import main
+    timings = {"import_ms": (time.perf_counter() - started) * 1000}
+
+    if stand_in:
+        import mongomock_motor
+
+        import database
+
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient()
+
+    asyncio.run(_child_requests(main.app, main.lifespan, timings))
+    print(json.dumps(timings))
+
+
+def _env(stand_in):
+    env = {**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"), "PYTHONPATH": ROOT}
+    env.setdefault("MONGO_DB_NAME", "event_planner_startup")
+    if stand_in:
+        # mongomock has no $text support.
+        env.setdefault("SEARCH_BACKEND", "memory")
+    return env
+
+
+def run_once(stand_in):
+    command = [sys.executable, os.path.abspath(__file__), "--child"]
+    if stand_in:
+        command.append("--stand-in")
+    output = subprocess.run(command, cwd=ROOT, env=_env(stand_in), capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(count, stand_in):
+    """Modules with the highest cumulative import time for ``import main`` (python -X importtime)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=_env(stand_in), capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stand-in", action="store_true", help="use mongomock_motor instead of MONGO_URL")
+    parser.add_argument("--importtime", type=int, default=0, help="also list the N slowest imports")
+    parser.add_argument("--json", action="store_true", help="print the medians as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.stand_in)
+        return
+
+    runs = [run_once(args.stand_in) for _ in range(args.runs)]
+    medians = {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+    if args.json:
+        print(json.dumps(medians, indent=2))
+    else:
+        print(f"median of {args.runs} cold starts")
+        print(f"import main:          {medians['import_ms']:9.1f} ms")
+        print(f"startup (lifespan):   {medians['startup_ms']:9.1f} ms")
+        for label, *_ in REQUESTS:
+            print(f"{label + ' first/second:':<22}{medians[f'{label}_first_ms']:9.1f} ms {medians[f'{label}_second_ms']:9.1f} ms")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for cumulative, module in slowest_imports(args.importtime, args.stand_in):
+            print(f"{cumulative / 1000:9.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
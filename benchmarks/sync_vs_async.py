@@ -0,0 +1,82 @@
+"""Compare a blocking PyMongo handler with a Motor handler at equal concurrency.
+
+Both apps run in-process behind the same ASGI transport, so the only difference
+is whether the handler waits on Mongo in the threadpool or on the event loop.
+
+    python benchmarks/sync_vs_async.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+load_dotenv()
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://127.0.0.1:27017")
+DB_NAME = "event_planner_bench"
+
+
+def build_sync_app():
+    app = FastAPI()
+    events = MongoClient(MONGO_URL)[DB_NAME]["events"]
+
+    @app.get("/events")
+    def list_events():
+        return [ev["_id"] for ev in events.find({"organizer": "bench@example.com"}, {"_id": 1})]
+
+    return app
+
+
+def build_async_app():
+    app = FastAPI()
+    events = AsyncIOMotorClient(MONGO_URL)[DB_NAME]["events"]
+
+    @app.get("/events")
+    async def list_events():
+        return [ev["_id"] async for ev in events.find({"organizer": "bench@example.com"}, {"_id": 1})]
+
+    return app
+
+
+def seed(count):
+    events = MongoClient(MONGO_URL)[DB_NAME]["events"]
+    events.drop()
+    events.insert_many([{"_id": i, "organizer": "bench@example.com"} for i in range(1, count + 1)])
+    events.create_index("organizer")
+
+
+async def drive(app, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def one():
+            async with semaphore:
+                response = await http.get("/events")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.events)
+    for name, build in (("sync (pymongo)", build_sync_app), ("async (motor)", build_async_app)):
+        rps = asyncio.run(drive(build(), args.requests, args.concurrency))
+        print(f"{name:16s} {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Throughput of serve.py as the worker count grows.
+
+For each worker count, starts ``serve.py`` on a scratch database
+(MONGO_DB_NAME, default event_planner_bench), creates a few events through the
+API, then drives GET requests from several client processes for a fixed time
+and reports requests/s, p50/p99 latency and the speedup over one worker.
+Needs a running mongod (MONGO_URL). The listing cache is switched off so every
+request reaches Mongo; pass --path /metrics for a request that doesn't.
+
+Keep the client processes off the server's cores if you can (e.g. run this
+under ``taskset``), otherwise the clients compete with the workers being
+measured.
+
+    python benchmarks/worker_scaling.py --workers 1,2,4,8 --duration 15 --clients 4 --concurrency 64
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MONGO_DB_NAME", "event_planner_bench")
+
+import httpx
+
+SERVER = [sys.executable, os.path.join(ROOT, "serve.py")]
+USER = "worker-scaling@example.com"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def start_server(workers, port):
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "LISTING_CACHE_BACKEND": "off",
+        "RATE_LIMIT_BACKEND": "off",
+        "CONCURRENCY_LIMITS": "default=0,search=0,attendees=0,login=0",
+    }
+    process = subprocess.Popen(SERVER, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).status_code == 200:
+                # Give every worker time to finish its lifespan before measuring.
+                time.sleep(1 + workers * 0.2)
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("serve.py did not become ready within 60s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _headers():
+    from utils.auth_utils import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': USER})}"}
+
+
+def seed(base_url, events):
+    headers = _headers()
+    with httpx.Client(base_url=base_url, headers=headers, timeout=30) as http:
+        existing = http.get("/events/my-events", params={"limit": events, "fields": "summary"}).json()
+        for i in range(len(existing), events):
+            http.post("/events/create", json={
+                "title": f"Scaling event {i}", "description": "worker scaling benchmark",
+                "date": "2025-06-01", "time": "18:00", "location": "Bench"
+            }).raise_for_status()
+
+
+async def _drive(base_url, path, concurrency, duration):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=_headers(), limits=limits, timeout=30) as http:
+        stop_at = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await http.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _client(args):
+    return asyncio.run(_drive(*args))
+
+
+def measure(base_url, path, clients, concurrency, duration):
+    per_client = max(1, concurrency // clients)
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(_client, [(base_url, path, per_client, duration)] * clients)
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--path", default="/events/my-events?limit=20&fields=summary")
+    parser.add_argument("--events", type=int, default=50, help="events owned by the benchmark user")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per worker count")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent requests across all clients")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in (int(value) for value in args.workers.split(",")):
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process = start_server(workers, port)
+        try:
+            seed(base_url, args.events)
+            measure(base_url, args.path, args.clients, args.concurrency, 1)  # warm-up
+            result = measure(base_url, args.path, args.clients, args.concurrency, args.duration)
+        finally:
+            stop_server(process)
+        baseline = baseline or result["rps"]
+        print(f"{workers:>7} {result['rps']:>10.0f} {result['rps'] / baseline:>7.2f}x "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,124 @@
+"""Application settings, read from the environment (and .env) once, on first use.
+
+Importing this module does no I/O: ``get_settings()`` loads .env, reads and
+validates every setting the first time it is called and returns the same
+frozen Settings afterwards. The app calls it at the start of its lifespan, so
+a bad configuration still stops a worker before it serves anything.
+"""
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_environment():
+    """Load .env into os.environ (existing variables win). Runs once per process."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def _choice(name: str, default: str, allowed):
+    value = os.getenv(name, default).strip().lower()
+    if value not in allowed:
+        raise ValueError(f"{name} must be one of: {', '.join(allowed)}")
+    return value
+
+
+@dataclass(frozen=True)
+class Settings:
+    secret_key: str
+    algorithm: str
+    access_token_expire_minutes: int
+    token_cache_size: int
+
+    # Password hashing runs in a dedicated process pool; requests beyond the
+    # queue limit are rejected with 429 instead of piling up behind bcrypt.
+    password_pool_size: int
+    password_queue_limit: int
+
+    mongo_url: str
+    mongo_db_name: str
+    # Pool settings are per process, so with several workers the total number
+    # of connections is roughly workers * mongo_max_pool_size. serve.py derives
+    # the per-worker size from MONGO_MAX_CONNECTIONS when it isn't set.
+    mongo_max_pool_size: int
+    mongo_min_pool_size: int
+    mongo_wait_queue_timeout_ms: int
+    mongo_compressors: str
+
+    # "embedded" keeps attendees inside each event document; "collection"
+    # stores them in event_attendees (see repositories/attendee_repository.py).
+    attendee_storage: str
+    search_backend: str
+    event_id_block_size: int
+
+    listing_cache_backend: str
+    listing_cache_ttl: int
+    listing_cache_size: int
+    redis_url: str
+
+    # Budgets for utils/rate_limit.py, "class=rate/burst,..." over its defaults.
+    rate_limit_backend: str
+    # Memory buckets get 1/rate_limit_processes of each budget; serve.py sets it to the worker count.
+    rate_limit_processes: int
+    rate_limits_user: str
+    rate_limits_ip: str
+    concurrency_limits: str
+
+    # utils/change_feed.py
+    event_feed_mode: str
+    event_feed_poll_interval: float
+    event_feed_queue_size: int
+    event_feed_heartbeat: float
+
+    log_level: str
+    log_info_sample_rate: float
+    log_sample_rates: str
+
+    @classmethod
+    def from_env(cls):
+        secret_key = (os.getenv("SECRET_KEY") or "").strip()
+        if not secret_key:
+            raise ValueError("SECRET_KEY missing from .env file")
 
-load_dotenv()
+        password_pool_size = int(os.getenv("PASSWORD_POOL_SIZE", os.cpu_count() or 1))
+        return cls(
+            secret_key=secret_key,
+            algorithm="HS256",
+            access_token_expire_minutes=60,
+            token_cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+            password_pool_size=password_pool_size,
+            password_queue_limit=int(os.getenv("PASSWORD_QUEUE_LIMIT", password_pool_size * 8)),
+            mongo_url=os.getenv("MONGO_URL", "mongodb://127.0.0.1:27017"),
+            mongo_db_name=os.getenv("MONGO_DB_NAME", "event_planner"),
+            mongo_max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+            mongo_min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+            mongo_wait_queue_timeout_ms=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+            mongo_compressors=os.getenv("MONGO_COMPRESSORS", ""),
+            attendee_storage=_choice("ATTENDEE_STORAGE", "embedded", ("embedded", "collection")),
+            search_backend=_choice("SEARCH_BACKEND", "text", ("text", "memory", "regex")),
+            event_id_block_size=int(os.getenv("EVENT_ID_BLOCK_SIZE", "1000")),
+            listing_cache_backend=_choice("LISTING_CACHE_BACKEND", "memory", ("memory", "redis", "off")),
+            listing_cache_ttl=int(os.getenv("LISTING_CACHE_TTL", "60")),
+            listing_cache_size=int(os.getenv("LISTING_CACHE_SIZE", "10000")),
+            redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            rate_limit_backend=_choice("RATE_LIMIT_BACKEND", "memory", ("memory", "redis", "off")),
+            rate_limit_processes=max(1, int(os.getenv("RATE_LIMIT_PROCESSES", "1"))),
+            rate_limits_user=os.getenv("RATE_LIMITS_USER", ""),
+            rate_limits_ip=os.getenv("RATE_LIMITS_IP", ""),
+            concurrency_limits=os.getenv("CONCURRENCY_LIMITS", ""),
+            event_feed_mode=_choice("EVENT_FEED_MODE", "auto", ("auto", "changestream", "poll", "off")),
+            event_feed_poll_interval=float(os.getenv("EVENT_FEED_POLL_INTERVAL", "2")),
+            event_feed_queue_size=int(os.getenv("EVENT_FEED_QUEUE_SIZE", "100")),
+            event_feed_heartbeat=float(os.getenv("EVENT_FEED_HEARTBEAT", "15")),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_info_sample_rate=float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0")),
+            log_sample_rates=os.getenv("LOG_SAMPLE_RATES", ""),
+        )
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY missing from .env file")
-SECRET_KEY = SECRET_KEY.strip()
 
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    load_environment()
+    return Settings.from_env()
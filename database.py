@@ -1,31 +1,191 @@
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import os
+import asyncio
+import logging
+import threading
+import time
 
-load_dotenv()
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://127.0.0.1:27017")
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, TEXT, monitoring
+from pymongo.errors import PyMongoError
+from config import get_settings
+from utils.metrics import command_listener
+
+logger = logging.getLogger(__name__)
 
 client = None
 db = None
 users_collection = None
 events_collection = None
 counters_collection = None
+event_attendees_collection = None
+
+# Every index the routes rely on, keyed by collection. Names are fixed so that
+# re-applying the registry on each startup is a no-op once the index exists.
+INDEXES = {
+    "users": [
+        # Partial so that documents without an email (e.g. the /test-db probe) don't collide on null.
+        {"name": "email_unique", "keys": [("email", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"email": {"$exists": True}}},
+    ],
+    "events": [
+        {"name": "organizer_1", "keys": [("organizer", ASCENDING)]},
+        {"name": "attendees_email_role", "keys": [("attendees.email", ASCENDING), ("attendees.role", ASCENDING)]},
+        {"name": "starts_at_id", "keys": [("starts_at", ASCENDING), ("_id", ASCENDING)]},
+        {"name": "title_description_text", "keys": [("title", TEXT), ("description", TEXT)],
+         "weights": {"title": 3, "description": 1}},
+    ],
+    "event_attendees": [
+        {"name": "event_email_unique", "keys": [("event_id", ASCENDING), ("email", ASCENDING)], "unique": True},
+        {"name": "email_role_event", "keys": [("email", ASCENDING), ("role", ASCENDING), ("event_id", ASCENDING)]},
+    ],
+}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so pools can be sized per worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = threading.local()
+        self.stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkout_wait_seconds_total": 0.0,
+            "checkout_wait_seconds_max": 0.0,
+        }
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump("connections_closed")
+
+    def connection_check_out_started(self, event):
+        # The driver checks out on the calling thread, so a thread-local start
+        # time pairs each start with its matching checked-out/failed event.
+        self._checkout_started.value = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._bump("checkout_failures")
+
+    def connection_checked_out(self, event):
+        started = getattr(self._checkout_started, "value", None)
+        waited = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            self.stats["checked_out"] += 1
+            self.stats["checkouts"] += 1
+            self.stats["checkout_wait_seconds_total"] += waited
+            self.stats["checkout_wait_seconds_max"] = max(self.stats["checkout_wait_seconds_max"], waited)
+
+    def connection_checked_in(self, event):
+        self._bump("checked_out", -1)
+
+
+pool_listener = PoolStatsListener()
+
+
+def _client_options(settings):
+    options = {
+        "serverSelectionTimeoutMS": 5000,
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "event_listeners": [pool_listener, command_listener],
+    }
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+    return options
+
+
+async def connect_to_mongo():
+    global client, db, users_collection, events_collection, counters_collection, event_attendees_collection
+
+    if client is not None:
+        return
+
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.mongo_url, **_client_options(settings))
+    db = client[settings.mongo_db_name]
+    users_collection = db["users"]
+    events_collection = db["events"]
+    counters_collection = db["counters"]
+    event_attendees_collection = db["event_attendees"]
+
+    # Open MONGO_MIN_POOL_SIZE connections up front so the first requests
+    # don't pay for connection setup.
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, settings.mongo_min_pool_size))))
+    logger.info("Connected to MongoDB successfully!")
+
+    if await counters_collection.find_one({"_id": "event_id"}) is None:
+        await counters_collection.insert_one({"_id": "event_id", "sequence_value": 0})
+        logger.info("Initialized event ID counter")
+
+
+def close_mongo_connection():
+    global client, db, users_collection, events_collection, counters_collection, event_attendees_collection
+
+    if client is not None:
+        client.close()
+        logger.info("MongoDB connection closed")
+    client = db = users_collection = events_collection = counters_collection = event_attendees_collection = None
+
+
+def pool_stats():
+    settings = get_settings()
+    return {
+        **pool_listener.stats,
+        "max_pool_size": settings.mongo_max_pool_size,
+        "min_pool_size": settings.mongo_min_pool_size,
+        "wait_queue_timeout_ms": settings.mongo_wait_queue_timeout_ms,
+        "compressors": settings.mongo_compressors or None,
+    }
+
+
+async def ensure_indexes():
+    report = {}
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        created, failed = [], {}
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                await collection.create_index(spec["keys"], **options)
+                created.append(spec["name"])
+            except PyMongoError as e:
+                failed[spec["name"]] = str(e)
+        report[collection_name] = {"applied": created, "failed": failed}
+    return report
+
 
-def connect_to_mongo():
-    global client, db, users_collection, events_collection, counters_collection
-
-    if client is None:
-        client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
-        db = client["event_planner"]
-        print("Connected to MongoDB successfully!")
-
-    if db is not None:
-        if users_collection is None:
-            users_collection = db["users"]
-        if events_collection is None:
-            events_collection = db["events"]
-        if counters_collection is None:
-            counters_collection = db["counters"]
-            if counters_collection.find_one({"_id": "event_id"}) is None:
-                counters_collection.insert_one({"_id": "event_id", "sequence_value": 0})
-                print("Initialized event ID counter")
+async def index_report():
+    report = {}
+    for collection_name, specs in INDEXES.items():
+        existing = set((await db[collection_name].index_information()).keys())
+        expected = [spec["name"] for spec in specs]
+        report[collection_name] = {
+            "expected": expected,
+            "existing": sorted(existing),
+            "missing": [name for name in expected if name not in existing],
+        }
+    return report
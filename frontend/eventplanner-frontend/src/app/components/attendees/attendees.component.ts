@@ -1,6 +1,7 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { Router, ActivatedRoute, RouterLink } from '@angular/router';
+import { Subscription } from 'rxjs';
 import { EventService } from '../../service/event.service';
 
 @Component({
@@ -10,7 +11,7 @@ import { EventService } from '../../service/event.service';
   templateUrl: './attendees.component.html',
   styleUrls: ['./attendees.component.css']
 })
-export class AttendeesComponent implements OnInit {
+export class AttendeesComponent implements OnInit, OnDestroy {
   eventId: string = '';
   eventTitle: string = '';
   attendees: any[] = [];
@@ -24,6 +25,8 @@ export class AttendeesComponent implements OnInit {
   loading = false;
   message = '';
 
+  private feed?: Subscription;
+
   constructor(
     private eventService: EventService,
     private router: Router,
@@ -37,6 +40,15 @@ export class AttendeesComponent implements OnInit {
       return;
     }
     this.loadAttendees();
+    this.feed = this.eventService.changes().subscribe(delta => {
+      if (delta.type === 'resync' || (delta.type === 'rsvp_changed' && String(delta.event_id) === this.eventId)) {
+        this.loadAttendees();
+      }
+    });
+  }
+
+  ngOnDestroy() {
+    this.feed?.unsubscribe();
   }
 
   loadAttendees() {
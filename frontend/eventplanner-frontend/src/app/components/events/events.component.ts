@@ -1,7 +1,8 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { Router, RouterLink } from '@angular/router';
+import { Subscription } from 'rxjs';
 import { EventService } from '../../service/event.service';
 
 @Component({
@@ -11,7 +12,7 @@ import { EventService } from '../../service/event.service';
   templateUrl: './events.component.html',
   styleUrls: ['./events.component.css']
 })
-export class EventsComponent implements OnInit {
+export class EventsComponent implements OnInit, OnDestroy {
   organizedEvents: any[] = [];
   invitedEvents: any[] = [];
   loading = false;
@@ -24,10 +25,26 @@ export class EventsComponent implements OnInit {
   time = '';
   location = '';
 
+  private feed?: Subscription;
+
   constructor(private eventService: EventService, private router: Router) {}
 
   ngOnInit() {
     this.loadEvents();
+    // Refetch when an invite, deletion or RSVP touches one of the listed events, instead of polling.
+    // A later 'ready' is a reconnect, which may have missed deltas.
+    let connected = false;
+    this.feed = this.eventService.changes().subscribe(delta => {
+      if (delta.type === 'ready' && !connected) {
+        connected = true;
+        return;
+      }
+      this.loadEvents();
+    });
+  }
+
+  ngOnDestroy() {
+    this.feed?.unsubscribe();
   }
 
   loadEvents() {
@@ -61,5 +61,59 @@ export class EventService {
   getEventAttendees(eventId: string): Observable<any> {
     return this.http.get(`${this.apiUrl}/${eventId}/attendees`, { headers: this.getHeaders() });
   }
+
+  // Live deltas from GET /events/feed ({type: 'invited' | 'event_deleted' | 'rsvp_changed' | 'resync', ...}).
+  // EventSource can't send the Authorization header, so the stream is read with fetch.
+  // Reconnects after a dropped connection; unsubscribing closes it.
+  changes(): Observable<any> {
+    return new Observable<any>(subscriber => {
+      const controller = new AbortController();
+      let retryMs = 5000;
+
+      const connect = async () => {
+        while (!controller.signal.aborted) {
+          try {
+            const res = await fetch(`${this.apiUrl}/feed`, {
+              headers: { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` },
+              signal: controller.signal
+            });
+            if (res.status === 401 || res.status === 404) {
+              subscriber.complete();
+              return;
+            }
+            if (!res.ok || !res.body) {
+              throw new Error(`feed returned ${res.status}`);
+            }
+            const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            while (true) {
+              const { value, done } = await reader.read();
+              if (done) break;
+              buffer += value;
+              let end;
+              while ((end = buffer.indexOf('\n\n')) >= 0) {
+                const message = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                const data = message.split('\n').filter(line => line.startsWith('data:')).map(line => line.slice(5)).join('\n');
+                const retry = message.split('\n').find(line => line.startsWith('retry:'));
+                if (retry) retryMs = Number(retry.slice(6)) || retryMs;
+                if (data) {
+                  const delta = JSON.parse(data);
+                  // A reconnect may have missed deltas, so 'ready' is passed on as well.
+                  subscriber.next(delta);
+                }
+              }
+            }
+          } catch (err) {
+            if (controller.signal.aborted) return;
+          }
+          await new Promise(resolve => setTimeout(resolve, retryMs));
+        }
+      };
+
+      connect();
+      return () => controller.abort();
+    });
+  }
 }
 
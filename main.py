@@ -1,32 +1,73 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.auth_routes import auth_router
 from routes.event_routes import event_router
 from routes.response_routes import response_router
 from routes.search_routes import search_router
-from database import connect_to_mongo
+from routes.feed_routes import feed_router
+import database
+from config import get_settings
+from database import connect_to_mongo, close_mongo_connection, ensure_indexes
 from routes.test_routes import test_router
+from routes.metrics_routes import metrics_router
+import utils.password_pool as password_pool
+from utils.logging_config import setup_logging, shutdown_logging
+from utils.metrics import MetricsMiddleware
+from utils.rate_limit import RateLimitMiddleware
+from utils import search_index
+from utils.change_feed import change_feed
+from utils.serializers import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_settings()
+    setup_logging()
+    # The pool processes start while Mongo connects.
+    password_pool_started = asyncio.create_task(password_pool.start())
+    await connect_to_mongo()
+    for collection_name, result in (await ensure_indexes()).items():
+        logger.info("Indexes on %s: applied=%s failed=%s", collection_name, result["applied"], result["failed"])
+    if get_settings().search_backend == "memory":
+        await search_index.event_index.rebuild(database.events_collection)
+        logger.info("In-memory search index built with %s events", len(search_index.event_index))
+    await password_pool_started
+    yield
+    change_feed.close()
+    await change_feed.stop()
+    password_pool.shutdown()
+    close_mongo_connection()
+    shutdown_logging()
 
-app = FastAPI(title="EventPlanner API", version="1.0.0")
 
+app = FastAPI(title="EventPlanner API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# The last middleware added runs first: metrics see every response, and CORS
+# headers are added to 429/503 rejections so browsers can read them.
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200", "http://frontend:80"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
-
-@app.on_event("startup")
-async def startup_db_client():
-    connect_to_mongo()
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(event_router, prefix="/events", tags=["Events"])
 app.include_router(response_router, prefix="/events", tags=["Response Management"])
 app.include_router(search_router, prefix="/events", tags=["Search & Filtering"])
+app.include_router(feed_router, prefix="/events", tags=["Event Feed"])
 app.include_router(test_router, tags=["Test"])
+app.include_router(metrics_router, tags=["Monitoring"])
 
 if __name__ == "__main__":
     import uvicorn
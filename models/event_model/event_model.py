@@ -1,5 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Literal
+from datetime import date as date_type, datetime
+from pydantic import BaseModel, EmailStr, field_validator, model_validator
+from typing import List, Literal, Optional
+
+from utils.event_dates import DEFAULT_TIMEZONE, parse_date, parse_time, resolve_timezone, to_starts_at
 
 class EventCreate(BaseModel):
     title: str
@@ -7,10 +10,60 @@ class EventCreate(BaseModel):
     date: str
     time: str
     location: str
+    timezone: str = DEFAULT_TIMEZONE
+
+    @field_validator("date")
+    @classmethod
+    def _check_date(cls, value: str) -> str:
+        try:
+            return parse_date(value).isoformat()
+        except ValueError:
+            raise ValueError("date must be a valid date in YYYY-MM-DD format (e.g., 2024-12-25)")
+
+    @field_validator("time")
+    @classmethod
+    def _check_time(cls, value: str) -> str:
+        return parse_time(value).strftime("%H:%M:%S" if value.count(":") == 2 else "%H:%M")
+
+    @field_validator("timezone")
+    @classmethod
+    def _check_timezone(cls, value: str) -> str:
+        resolve_timezone(value)
+        return value
+
+    @property
+    def starts_at(self) -> datetime:
+        return to_starts_at(parse_date(self.date), parse_time(self.time), self.timezone)
+
+class EventDateRange(BaseModel):
+    start_date: Optional[date_type] = None
+    end_date: Optional[date_type] = None
+
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
+    def _check_format(cls, value, info):
+        if value is None or isinstance(value, date_type):
+            return value
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"{info.field_name} cannot be empty")
+        try:
+            return parse_date(value)
+        except ValueError:
+            raise ValueError(f"{info.field_name} must be a valid date in YYYY-MM-DD format (e.g., 2024-12-25)")
+
+    @model_validator(mode="after")
+    def _check_order(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValueError("start_date must be before or equal to end_date")
+        return self
 
 class InviteUser(BaseModel):
     event_id: str
     email: EmailStr
 
+class BulkInviteUsers(BaseModel):
+    event_id: str
+    emails: List[EmailStr]
+
 class EventResponse(BaseModel):
     response: Literal["Going", "Maybe", "Not Going"]
@@ -0,0 +1,7 @@
+from .attendee_repository import (
+    CollectionAttendeeRepository,
+    EmbeddedAttendeeRepository,
+    get_attendee_repository,
+)
+
+__all__ = ["CollectionAttendeeRepository", "EmbeddedAttendeeRepository", "get_attendee_repository"]
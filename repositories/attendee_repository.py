@@ -0,0 +1,355 @@
+"""Access to event memberships for both storage layouts.
+
+``embedded``   -- attendees live in the ``attendees`` array of each event (the original layout).
+``collection`` -- one document per (event_id, email) in ``event_attendees``.
+
+The layout is chosen with the ATTENDEE_STORAGE env var. Routes only talk to the
+repository, so switching layouts is a config change plus a run of
+``python -m repositories.migrate_attendees``.
+"""
+import asyncio
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import database
+from config import get_settings
+from utils.response_counts import (
+    COUNTERS_PRESENT, NO_RESPONSE, RESPONSE_KEYS, counter_field, counts_after, repair_response_counts,
+    response_inc
+)
+
+# Fields that describe a membership, in the shape of an embedded attendee entry.
+_ATTENDEE_PROJECTION = {"_id": 0, "email": 1, "role": 1, "response": 1, "response_updated_at": 1}
+# Tries for a write that lost a race, or for the counter update that follows a membership write.
+WRITE_ATTEMPTS = 5
+_DUPLICATE_KEY = 11000
+
+# Pipeline updates bump the version like {"$inc": {"version": 1}} would.
+_BUMP_VERSION = {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}
+
+
+class EmbeddedAttendeeRepository:
+    storage = "embedded"
+
+    async def create_event(self, event_doc: dict):
+        event_doc["attendees"] = [{"email": event_doc["organizer"], "role": "organizer"}]
+        await database.events_collection.insert_one(event_doc)
+
+    async def member_filter(self, email: str, role=None):
+        """Filter on the events collection matching events the user belongs to."""
+        if role:
+            return {"attendees": {"$elemMatch": {"email": email, "role": role}}}
+        return {"attendees.email": email}
+
+    async def attach_viewer(self, event_docs: list, email: str):
+        """Make sure each event carries the viewer's attendee entry. Embedded events already do."""
+        return event_docs
+
+    def viewer_stages(self, email: str):
+        """Aggregation stages that do what attach_viewer does; nothing to add here."""
+        return []
+
+    async def find_attendee(self, event_id: int, email: str):
+        event = await database.events_collection.find_one(
+            {"_id": event_id, "attendees.email": email},
+            {"attendees": {"$elemMatch": {"email": email}}}
+        )
+        return event["attendees"][0] if event else None
+
+    async def existing_emails(self, event_id: int, emails: list):
+        event = await database.events_collection.find_one({"_id": event_id}, {"_id": 0, "attendees.email": 1})
+        wanted = set(emails)
+        return {a["email"] for a in (event or {}).get("attendees", []) if a.get("email") in wanted}
+
+    async def add_attendee(self, event_id: int, email: str):
+        return await self.add_attendees(event_id, [email])
+
+    async def add_attendees(self, event_id: int, emails: list):
+        """Append the users and count them in one update; returns the emails actually added.
+
+        The update only matches while none of the emails is on the event yet, so
+        concurrent invites can't add anyone twice. On a miss the emails already
+        there are dropped and the rest retried.
+        """
+        for _ in range(WRITE_ATTEMPTS):
+            if not emails:
+                return []
+            entries = [{"email": email, "role": "attendee"} for email in emails]
+            result = await database.events_collection.update_one(
+                {"_id": event_id, "attendees.email": {"$nin": emails}},
+                [
+                    {"$set": {
+                        "attendees": {"$concatArrays": [{"$ifNull": ["$attendees", []]}, {"$literal": entries}]},
+                        **_BUMP_VERSION
+                    }},
+                    {"$set": {"response_counts": counts_after({NO_RESPONSE: len(emails)})}},
+                ]
+            )
+            if result.matched_count:
+                return emails
+            existing = await self.existing_emails(event_id, emails)
+            if not existing:
+                # Nothing was a duplicate, so the event itself is gone.
+                return []
+            emails = [email for email in emails if email not in existing]
+        raise RuntimeError(f"Invites to event {event_id} kept conflicting, gave up after {WRITE_ATTEMPTS} attempts")
+
+    async def set_response(self, event_id: int, email: str, response: str, updated_at):
+        """Store the RSVP, move the counters and bump the version in one pipeline update.
+
+        The counter change is worked out on the server from the entry being
+        replaced, so concurrent RSVPs can't move the counters twice. Returns the
+        attendee entry as it was before, or None if the user is not a
+        non-organizer attendee of the event.
+        """
+        previous_response = {"$let": {
+            "vars": {"entry": {"$arrayElemAt": [
+                {"$filter": {"input": "$attendees", "cond": {"$eq": ["$$this.email", email]}}}, 0
+            ]}},
+            "in": {"$ifNull": ["$$entry.response", NO_RESPONSE]}
+        }}
+        answered = {
+            # Attendee entries only carry these fields.
+            "email": "$$this.email",
+            "role": "$$this.role",
+            "response": {"$literal": response},
+            "response_updated_at": {"$literal": updated_at},
+        }
+        deltas = {
+            key: {"$subtract": [int(key == response), {"$cond": [{"$eq": ["$_previous_response", key]}, 1, 0]}]}
+            for key in RESPONSE_KEYS
+        }
+        previous = await database.events_collection.find_one_and_update(
+            {
+                "_id": event_id,
+                "organizer": {"$ne": email},
+                "attendees": {"$elemMatch": {"email": email, "role": {"$ne": "organizer"}}}
+            },
+            [
+                {"$set": {"_previous_response": previous_response}},
+                {"$set": {
+                    "attendees": {"$map": {
+                        "input": "$attendees",
+                        "in": {"$cond": [{"$eq": ["$$this.email", email]}, answered, "$$this"]}
+                    }},
+                    **_BUMP_VERSION
+                }},
+                {"$set": {"response_counts": counts_after(deltas)}},
+                {"$project": {"_previous_response": 0}},
+            ],
+            projection={"attendees": {"$elemMatch": {"email": email}}},
+            return_document=ReturnDocument.BEFORE
+        )
+        return previous["attendees"][0] if previous else None
+
+    async def member_emails(self, event_id: int):
+        event = await database.events_collection.find_one({"_id": event_id}, {"_id": 0, "attendees.email": 1})
+        return [a["email"] for a in (event or {}).get("attendees", []) if a.get("email")]
+
+    async def memberships(self, emails: list):
+        """{email: {event_id: role}} for the given users; only their own entries leave the server."""
+        pipeline = [
+            {"$match": {"attendees.email": {"$in": emails}}},
+            {"$project": {"attendees": {"$filter": {
+                "input": "$attendees", "cond": {"$in": ["$$this.email", emails]}
+            }}}}
+        ]
+        result = {}
+        for event in await database.events_collection.aggregate(pipeline).to_list(length=None):
+            for attendee in event["attendees"]:
+                result.setdefault(attendee["email"], {})[event["_id"]] = attendee.get("role", "attendee")
+        return result
+
+    async def list_attendees(self, event_doc: dict):
+        if "attendees" not in event_doc:
+            event_doc = await database.events_collection.find_one({"_id": event_doc["_id"]}, {"attendees": 1}) or {}
+        return event_doc.get("attendees", [])
+
+    async def delete_event(self, event_id: int):
+        result = await database.events_collection.delete_one({"_id": event_id})
+        return result.deleted_count
+
+    async def repair_response_counts(self, event_id=None):
+        return await repair_response_counts(database.events_collection, event_id)
+
+
+class CollectionAttendeeRepository:
+    storage = "collection"
+
+    async def create_event(self, event_doc: dict):
+        event_doc.pop("attendees", None)
+        await database.events_collection.insert_one(event_doc)
+        await database.event_attendees_collection.insert_one(
+            {"event_id": event_doc["_id"], "email": event_doc["organizer"], "role": "organizer"}
+        )
+
+    async def member_filter(self, email: str, role=None):
+        query = {"email": email}
+        if role:
+            query["role"] = role
+        memberships = database.event_attendees_collection.find(query, {"_id": 0, "event_id": 1})
+        event_ids = [m["event_id"] async for m in memberships]
+        return {"_id": {"$in": event_ids}}
+
+    async def attach_viewer(self, event_docs: list, email: str):
+        if not event_docs:
+            return event_docs
+        memberships = database.event_attendees_collection.find(
+            {"event_id": {"$in": [ev["_id"] for ev in event_docs]}, "email": email},
+            {**_ATTENDEE_PROJECTION, "event_id": 1}
+        )
+        by_event = {}
+        async for membership in memberships:
+            by_event[membership.pop("event_id")] = membership
+        for ev in event_docs:
+            ev["attendees"] = [by_event[ev["_id"]]] if ev["_id"] in by_event else []
+        return event_docs
+
+    def viewer_stages(self, email: str):
+        return [{
+            "$lookup": {
+                "from": "event_attendees",
+                "let": {"event_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$event_id", "$$event_id"]}, "email": email}},
+                    {"$project": _ATTENDEE_PROJECTION}
+                ],
+                "as": "attendees"
+            }
+        }]
+
+    async def find_attendee(self, event_id: int, email: str):
+        return await database.event_attendees_collection.find_one(
+            {"event_id": event_id, "email": email}, _ATTENDEE_PROJECTION
+        )
+
+    async def existing_emails(self, event_id: int, emails: list):
+        memberships = database.event_attendees_collection.find(
+            {"event_id": event_id, "email": {"$in": list(emails)}}, {"_id": 0, "email": 1}
+        )
+        return {m["email"] async for m in memberships}
+
+    async def add_attendee(self, event_id: int, email: str):
+        return await self.add_attendees(event_id, [email])
+
+    async def add_attendees(self, event_id: int, emails: list):
+        """Insert the memberships and count them; returns the emails actually added.
+
+        Emails already on the event (e.g. from a concurrent invite) hit the unique
+        index and are left out. Whatever was inserted is counted before any other
+        insert error is raised.
+        """
+        error = None
+        try:
+            await database.event_attendees_collection.insert_many(
+                [{"event_id": event_id, "email": email, "role": "attendee"} for email in emails],
+                ordered=False
+            )
+            failed = set()
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            failed = {write_error["op"]["email"] for write_error in write_errors}
+            if any(write_error.get("code") != _DUPLICATE_KEY for write_error in write_errors):
+                error = e
+        added = [email for email in emails if email not in failed]
+        if added:
+            await self._move_counts(event_id, {counter_field(NO_RESPONSE): len(added), "version": 1})
+        if error is not None:
+            raise error
+        return added
+
+    async def _move_counts(self, event_id: int, inc: dict):
+        """Apply ``inc`` to the event's counters after a membership write, retrying on errors.
+
+        Events without a full set of counters (created before them) are recounted
+        from event_attendees instead, which already includes the write.
+        """
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                result = await database.events_collection.update_one({"_id": event_id, **COUNTERS_PRESENT}, {"$inc": inc})
+                if not result.matched_count and not await self.repair_response_counts(event_id):
+                    await database.events_collection.update_one({"_id": event_id}, {"$inc": {"version": 1}})
+                return
+            except PyMongoError:
+                if attempt == WRITE_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+    async def set_response(self, event_id: int, email: str, response: str, updated_at):
+        """Store the RSVP, then move the counters on the event and bump its version.
+
+        The two writes are in different collections, so the counter update is
+        retried and raises if it still fails; the stored RSVP then needs
+        ``repair_response_counts``.
+        """
+        previous = await database.event_attendees_collection.find_one_and_update(
+            {"event_id": event_id, "email": email, "role": {"$ne": "organizer"}},
+            {"$set": {"response": response, "response_updated_at": updated_at}},
+            projection=_ATTENDEE_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is not None:
+            await self._move_counts(event_id, response_inc(previous.get("response"), response))
+        return previous
+
+    async def member_emails(self, event_id: int):
+        memberships = database.event_attendees_collection.find({"event_id": event_id}, {"_id": 0, "email": 1})
+        return [m["email"] async for m in memberships]
+
+    async def memberships(self, emails: list):
+        memberships = database.event_attendees_collection.find(
+            {"email": {"$in": emails}}, {"_id": 0, "event_id": 1, "email": 1, "role": 1}
+        )
+        result = {}
+        async for membership in memberships:
+            result.setdefault(membership["email"], {})[membership["event_id"]] = membership.get("role", "attendee")
+        return result
+
+    async def list_attendees(self, event_doc: dict):
+        cursor = database.event_attendees_collection.find({"event_id": event_doc["_id"]}, _ATTENDEE_PROJECTION)
+        return await cursor.to_list(length=None)
+
+    async def delete_event(self, event_id: int):
+        result = await database.events_collection.delete_one({"_id": event_id})
+        await database.event_attendees_collection.delete_many({"event_id": event_id})
+        return result.deleted_count
+
+    async def repair_response_counts(self, event_id=None):
+        match = {} if event_id is None else {"event_id": event_id}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"event_id": "$event_id", "response": {"$ifNull": ["$response", NO_RESPONSE]}},
+                "count": {"$sum": 1}
+            }}
+        ]
+        counts = {}
+        async for row in database.event_attendees_collection.aggregate(pipeline):
+            event_counts = counts.setdefault(row["_id"]["event_id"], {key: 0 for key in RESPONSE_KEYS})
+            if row["_id"]["response"] in event_counts:
+                event_counts[row["_id"]["response"]] = row["count"]
+
+        if not counts:
+            return 0
+        result = await database.events_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": eid, "response_counts": {"$ne": c}},
+                    {"$set": {"response_counts": c}, "$inc": {"version": 1}}
+                )
+                for eid, c in counts.items()
+            ],
+            ordered=False
+        )
+        return result.modified_count
+
+
+_repositories = {
+    "embedded": EmbeddedAttendeeRepository(),
+    "collection": CollectionAttendeeRepository(),
+}
+
+
+def get_attendee_repository():
+    return _repositories[get_settings().attendee_storage]
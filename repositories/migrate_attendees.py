@@ -0,0 +1,65 @@
+"""Move embedded ``attendees`` arrays into the ``event_attendees`` collection.
+
+Events are processed in batches. Each batch upserts its memberships and then
+unsets the array, so the migration can be interrupted and re-run safely.
+
+    python -m repositories.migrate_attendees --batch-size 500
+"""
+import argparse
+import asyncio
+
+from pymongo import UpdateOne
+
+import database
+
+
+async def migrate(batch_size: int = 500):
+    migrated_events = 0
+    migrated_attendees = 0
+
+    while True:
+        batch = await database.events_collection.find(
+            {"attendees": {"$exists": True}}, {"attendees": 1}
+        ).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+
+        operations = []
+        for event in batch:
+            for attendee in event.get("attendees", []):
+                if not attendee.get("email"):
+                    continue
+                operations.append(UpdateOne(
+                    {"event_id": event["_id"], "email": attendee["email"]},
+                    {"$setOnInsert": {"event_id": event["_id"], **attendee}},
+                    upsert=True
+                ))
+
+        if operations:
+            await database.event_attendees_collection.bulk_write(operations, ordered=False)
+        await database.events_collection.update_many(
+            {"_id": {"$in": [event["_id"] for event in batch]}},
+            {"$unset": {"attendees": ""}}
+        )
+
+        migrated_events += len(batch)
+        migrated_attendees += len(operations)
+        print(f"Migrated {migrated_events} events / {migrated_attendees} attendees so far")
+
+    return migrated_events, migrated_attendees
+
+
+async def _main(batch_size: int):
+    await database.connect_to_mongo()
+    try:
+        events, attendees = await migrate(batch_size)
+        print(f"Done: {events} events, {attendees} attendees moved to event_attendees")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
@@ -1,59 +1,39 @@
-print("event_routes.py LOADED")
-
-import os
 import logging
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from datetime import datetime
+from typing import Literal, Optional
 
 import database
-from models.event_model.event_model import EventCreate, InviteUser
-import utils.auth_utils as auth_utils
+from models.event_model.event_model import BulkInviteUsers, EventCreate, InviteUser
+from utils.dependencies import get_current_user
+from utils.pagination import MAX_PAGE_SIZE, fetch_page, summary_projection
+from utils.streaming import ndjson_response, wants_ndjson
+from utils.response_counts import initial_counts
+from repositories import get_attendee_repository
+from utils.search_index import index_event, unindex_event
+from utils import etags, listing_cache
+from utils.etags import VERSION_PROJECTION
+from utils.serializers import dumps, serialize_event
+from utils.id_allocator import event_ids
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-print("Loaded event_routes from:", os.path.abspath(__file__))
-
 event_router = APIRouter()
 
-def get_current_user(Authorization: str = Header(None)):
-    try:
-        if not Authorization:
-            raise HTTPException(status_code=401, detail="Missing Authorization header")
-
-        token = Authorization.replace("Bearer ", "").strip()
-        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=["HS256"])
-
-        return payload.get("sub")
-
-    except Exception as e:
-        logger.error(f"Token decode error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+MAX_BULK_INVITES = 1000
 
 
 def _get_events_collection():
-    database.connect_to_mongo()
     if database.events_collection is None:
         raise HTTPException(status_code=500, detail="Events collection not initialized")
     return database.events_collection
 
 
-def _get_next_event_id():
-    database.connect_to_mongo()
+async def _get_next_event_id():
     if database.counters_collection is None:
         raise HTTPException(status_code=500, detail="Counters collection not initialized")
     
-    result = database.counters_collection.find_one_and_update(
-        {"_id": "event_id"},
-        {"$inc": {"sequence_value": 1}},
-        return_document=True
-    )
-    
-    if result is None:
-        database.counters_collection.insert_one({"_id": "event_id", "sequence_value": 1})
-        return 1
-    
-    return result["sequence_value"]
+    return await event_ids.next_id(database.counters_collection)
 
 
 def _validate_event_id(event_id: str):
@@ -72,46 +52,58 @@ def _validate_event_id(event_id: str):
         raise HTTPException(status_code=400, detail="Invalid event ID format. Event ID must be an integer.")
 
 
-def _serialize_event(event_doc, user_email: str):
-    event_copy = {**event_doc}
-    
-    if "_id" in event_copy:
-        event_copy["id"] = event_copy.pop("_id")
-    elif "id" not in event_copy:
-        event_copy["id"] = event_copy.get("event_id")
-
-    user_role = "attendee"
-    user_response = None
-    if event_copy.get("organizer") == user_email:
-        user_role = "organizer"
-    else:
-        for attendee in event_copy.get("attendees", []):
-            if attendee.get("email") == user_email:
-                user_role = attendee.get("role", "attendee")
-                user_response = attendee.get("response")
-                break
-
-    event_copy["user_role"] = user_role
-    event_copy["is_organizer"] = event_copy.get("organizer") == user_email
-    event_copy["user_response"] = user_response
-    
-    if event_copy.get("attendees"):
-        for attendee in event_copy["attendees"]:
-            if attendee.get("email") == user_email:
-                attendee["my_response"] = attendee.get("response")
-                break
-    
-    return event_copy
+def _listing_response(body: bytes, next_cursor, etag: str):
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _list_events(endpoint: str, make_query, user_email: str, limit, cursor, fields, if_none_match):
+    """Serve a listing from the cache, or run make_query() against Mongo and cache the body.
+
+    With If-None-Match and no cached copy, the page is first read with only
+    _id/version projected; if its ETag still matches, the response is a 304.
+    """
+    cache_key = None
+    if listing_cache.enabled():
+        cache_key, cached = await listing_cache.lookup(user_email, endpoint, f"{fields}:{limit}:{cursor}")
+        if cached:
+            body, next_cursor, etag = cached
+            if etags.matches(if_none_match, etag):
+                return etags.not_modified(etag)
+            return _listing_response(body, next_cursor, etag)
+
+    events_collection = _get_events_collection()
+    query = await make_query()
+
+    if if_none_match:
+        stamps, next_cursor = await fetch_page(
+            events_collection, query, limit, cursor, {**VERSION_PROJECTION, "starts_at": 1}
+        )
+        etag = etags.listing_etag(user_email, fields, stamps, next_cursor)
+        if etags.matches(if_none_match, etag):
+            return etags.not_modified(etag)
+
+    projection = summary_projection(user_email) if fields == "summary" else None
+    docs, next_cursor = await fetch_page(events_collection, query, limit, cursor, projection)
+    etag = etags.listing_etag(user_email, fields, docs, next_cursor)
+    docs = await get_attendee_repository().attach_viewer(docs, user_email)
+
+    events = [serialize_event(ev, user_email, fields) for ev in docs]
+    body = dumps(events)
+
+    if cache_key:
+        await listing_cache.store(cache_key, body, next_cursor, etag)
+    logger.info("User %s retrieved %s events from %s", user_email, len(events), endpoint)
+    return _listing_response(body, next_cursor, etag)
 
 @event_router.post("/create")
-def create_event(event: EventCreate, Authorization: str = Header(None)):
+async def create_event(event: EventCreate, user_email: str = Depends(get_current_user)):
     try:
         logger.info("/events/create endpoint called")
-        user_email = get_current_user(Authorization)
 
-        events_collection = _get_events_collection()
-        
-        event_id = _get_next_event_id()
+        event_id = await _get_next_event_id()
 
         new_event = {
             "_id": event_id,
@@ -119,185 +111,263 @@ def create_event(event: EventCreate, Authorization: str = Header(None)):
             "description": event.description,
             "date": event.date,
             "time": event.time,
+            "starts_at": event.starts_at,
+            "timezone": event.timezone,
             "location": event.location,
             "organizer": user_email,
-            "attendees": [
-                {"email": user_email, "role": "organizer"}
-            ],
+            "response_counts": initial_counts(1),
+            "version": 1,
             "created_at": datetime.utcnow()
         }
 
-        events_collection.insert_one(new_event)
+        await get_attendee_repository().create_event(new_event)
+        index_event(event_id, event.title, event.description)
+        await listing_cache.invalidate([user_email])
 
-        logger.info(f"Event created by {user_email}: {event_id}")
+        logger.info("Event created by %s: %s", user_email, event_id)
         return {"message": "Event created successfully", "event_id": event_id}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating event: {str(e)}")
+        logger.error("Error creating event: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
 @event_router.get("/my-events")
-def get_my_events(Authorization: str = Header(None)):
+async def get_my_events(
+    user_email: str = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Literal["full", "summary"] = Query("full", description="'summary' omits the attendees array"),
+    if_none_match: Optional[str] = Header(None)
+):
     try:
         logger.info("/events/my-events endpoint called")
-        user_email = get_current_user(Authorization)
 
-        events_collection = _get_events_collection()
-        events = [
-            _serialize_event(ev, user_email)
-            for ev in events_collection.find({"organizer": user_email})
-        ]
+        async def make_query():
+            return {"organizer": user_email}
 
-        logger.info(f"User {user_email} retrieved {len(events)} organized events")
-        return events
+        return await _list_events("my-events", make_query, user_email, limit, cursor, fields, if_none_match)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching my events: {str(e)}")
+        logger.error("Error fetching my events: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 @event_router.get("/me")
-def get_all_user_events(Authorization: str = Header(None)):
+async def get_all_user_events(
+    user_email: str = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Literal["full", "summary"] = Query("full", description="'summary' omits the attendees array"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
     try:
         logger.info("/events/me endpoint called")
-        user_email = get_current_user(Authorization)
 
-        events_collection = _get_events_collection()
-        events = [
-            _serialize_event(ev, user_email)
-            for ev in events_collection.find({
+        repository = get_attendee_repository()
+
+        async def make_query():
+            return {
                 "$or": [
                     {"organizer": user_email},
-                    {"attendees.email": user_email}
+                    await repository.member_filter(user_email)
                 ]
-            })
-        ]
+            }
+
+        if wants_ndjson(accept):
+            projection = summary_projection(user_email) if fields == "summary" else None
+            logger.info("Streaming events for user %s", user_email)
+            return ndjson_response(
+                _get_events_collection().find(await make_query(), projection),
+                lambda ev: serialize_event(ev, user_email, fields),
+                lambda batch: repository.attach_viewer(batch, user_email)
+            )
 
-        logger.info(f"User {user_email} retrieved {len(events)} total events")
-        return events
+        return await _list_events("me", make_query, user_email, limit, cursor, fields, if_none_match)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching events for user: {str(e)}")
+        logger.error("Error fetching events for user: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
 
 @event_router.get("/invited")
-def get_invited_events(Authorization: str = Header(None)):
+async def get_invited_events(
+    user_email: str = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Literal["full", "summary"] = Query("full", description="'summary' omits the attendees array"),
+    if_none_match: Optional[str] = Header(None)
+):
     try:
         logger.info("/events/invited endpoint called")
-        user_email = get_current_user(Authorization)
 
-        events_collection = _get_events_collection()
-        events = [
-            _serialize_event(ev, user_email)
-            for ev in events_collection.find({
-                "attendees": {
-                    "$elemMatch": {
-                        "email": user_email,
-                        "role": "attendee"
-                    }
-                }
-            })
-        ]
-
-        logger.info(f"User {user_email} retrieved {len(events)} invited events")
-        return events
+        async def make_query():
+            return await get_attendee_repository().member_filter(user_email, role="attendee")
+
+        return await _list_events("invited", make_query, user_email, limit, cursor, fields, if_none_match)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching invited events: {str(e)}")
+        logger.error("Error fetching invited events: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
 
 @event_router.post("/invite")
-def invite_user(invite: InviteUser, Authorization: str = Header(None)):
+async def invite_user(invite: InviteUser, user_email: str = Depends(get_current_user)):
     try:
         logger.info("/events/invite endpoint called")
-        user_email = get_current_user(Authorization)
 
         events_collection = _get_events_collection()
 
         event_id = _validate_event_id(invite.event_id)
 
-        event = events_collection.find_one({"_id": event_id})
+        event = await events_collection.find_one({"_id": event_id}, {"organizer": 1})
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
 
         if event.get("organizer") != user_email:
-            logger.warning(f"User {user_email} attempted to invite to event {event_id} (not organizer)")
+            logger.warning("User %s attempted to invite to event %s (not organizer)", user_email, event_id)
             raise HTTPException(
                 status_code=403, 
                 detail="Only the event organizer can invite users to this event"
             )
 
-        for attendee in event.get("attendees", []):
-            if attendee.get("email") == invite.email:
-                raise HTTPException(status_code=400, detail="User already invited to this event")
+        repository = get_attendee_repository()
+        if await repository.find_attendee(event_id, invite.email):
+            raise HTTPException(status_code=400, detail="User already invited to this event")
 
-        database.connect_to_mongo()
         if database.users_collection is None:
             raise HTTPException(status_code=500, detail="Users collection not initialized")
         
-        existing_user = database.users_collection.find_one({"email": invite.email})
+        existing_user = await database.users_collection.find_one({"email": invite.email})
         if not existing_user:
-            logger.warning(f"Invite failed: email {invite.email} does not exist in the system")
+            logger.warning("Invite failed: email %s does not exist in the system", invite.email)
             raise HTTPException(
                 status_code=404, 
                 detail="User with this email does not exist. Please invite only registered users."
             )
 
-        events_collection.update_one(
-            {"_id": event_id},
-            {"$push": {"attendees": {"email": invite.email, "role": "attendee"}}}
-        )
+        if not await repository.add_attendee(event_id, invite.email):
+            # A concurrent invite added them since the check above.
+            raise HTTPException(status_code=400, detail="User already invited to this event")
+        await listing_cache.invalidate_event(event_id)
 
-        logger.info(f"User {invite.email} invited to event {event_id} by organizer {user_email}")
+        logger.info("User %s invited to event %s by organizer %s", invite.email, event_id, user_email)
         return {"message": "User invited successfully"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error inviting user: {str(e)}")
+        logger.error("Error inviting user: %s", e)
+        raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
+
+@event_router.post("/invite/bulk")
+async def bulk_invite_users(invite: BulkInviteUsers, user_email: str = Depends(get_current_user)):
+    try:
+        logger.info("/events/invite/bulk endpoint called")
+
+        events_collection = _get_events_collection()
+
+        event_id = _validate_event_id(invite.event_id)
+
+        emails = list(dict.fromkeys(invite.emails))
+        if not emails:
+            raise HTTPException(status_code=400, detail="At least one email is required")
+        if len(emails) > MAX_BULK_INVITES:
+            raise HTTPException(status_code=400, detail=f"Too many emails (max {MAX_BULK_INVITES} per request)")
+
+        event = await events_collection.find_one({"_id": event_id}, {"organizer": 1})
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        if event.get("organizer") != user_email:
+            logger.warning("User %s attempted to bulk invite to event %s (not organizer)", user_email, event_id)
+            raise HTTPException(
+                status_code=403, 
+                detail="Only the event organizer can invite users to this event"
+            )
+
+        if database.users_collection is None:
+            raise HTTPException(status_code=500, detail="Users collection not initialized")
+
+        registered = {
+            u["email"] async for u in database.users_collection.find(
+                {"email": {"$in": emails}}, {"_id": 0, "email": 1}
+            )
+        }
+
+        repository = get_attendee_repository()
+        already_invited = await repository.existing_emails(event_id, emails)
+
+        to_invite = [email for email in emails if email in registered and email not in already_invited]
+        # Concurrent invites may have added some of them since existing_emails.
+        invited = set(await repository.add_attendees(event_id, to_invite)) if to_invite else set()
+        if invited:
+            await listing_cache.invalidate_event(event_id)
+
+        results = []
+        for email in emails:
+            if email in invited:
+                results.append({"email": email, "status": "invited"})
+            elif email in registered or email in already_invited:
+                results.append({"email": email, "status": "already_invited"})
+            else:
+                results.append({"email": email, "status": "not_registered"})
+
+        logger.info("%s of %s users invited to event %s by organizer %s", len(invited), len(emails), event_id, user_email)
+        return {
+            "message": f"{len(invited)} users invited successfully",
+            "invited_count": len(invited),
+            "results": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error bulk inviting users: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
 @event_router.delete("/{event_id}")
-def delete_event(event_id: str, Authorization: str = Header(None)):
+async def delete_event(event_id: str, user_email: str = Depends(get_current_user)):
     try:
-        logger.info(f"/events/delete endpoint called for event {event_id}")
-        user_email = get_current_user(Authorization)
+        logger.info("/events/delete endpoint called for event %s", event_id)
 
         events_collection = _get_events_collection()
 
         event_id_int = _validate_event_id(event_id)
 
-        event = events_collection.find_one({"_id": event_id_int})
+        event = await events_collection.find_one({"_id": event_id_int}, {"organizer": 1})
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
 
         organizer_email = event.get("organizer")
         if organizer_email != user_email:
-            logger.warning(f"User {user_email} attempted to delete event {event_id} created by {organizer_email}")
+            logger.warning("User %s attempted to delete event %s created by %s", user_email, event_id, organizer_email)
             raise HTTPException(
                 status_code=403, 
                 detail="You cannot delete this event. Only the event creator can delete it."
             )
 
-        delete_result = events_collection.delete_one({"_id": event_id_int})
+        members = await listing_cache.event_members(event_id_int)
+        deleted_count = await get_attendee_repository().delete_event(event_id_int)
         
-        if delete_result.deleted_count == 0:
-            logger.error(f"Failed to delete event {event_id}")
+        if deleted_count == 0:
+            logger.error("Failed to delete event %s", event_id)
             raise HTTPException(status_code=500, detail="Failed to delete event")
 
-        logger.info(f"Event {event_id} deleted by creator {user_email}")
+        unindex_event(event_id_int)
+        await listing_cache.invalidate(members)
+
+        logger.info("Event %s deleted by creator %s", event_id, user_email)
         return {"message": "Event deleted successfully"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting event: {str(e)}")
+        logger.error("Error deleting event: %s", e)
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from config import get_settings
+from utils.change_feed import CLOSE, change_feed
+from utils.dependencies import get_current_user
+from utils.streaming import SSE_MEDIA_TYPE, sse_message
+
+logger = logging.getLogger(__name__)
+
+feed_router = APIRouter()
+
+# How long the browser waits before reconnecting a dropped feed, in ms.
+SSE_RETRY_MS = 5000
+
+
+async def _messages(user_email: str, queue):
+    heartbeat = get_settings().event_feed_heartbeat
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+        yield sse_message("ready", {"type": "ready", "mode": change_feed.mode})
+        while True:
+            try:
+                delta = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield b": keepalive\n\n"
+                continue
+            if delta is CLOSE:
+                # The server is stopping; the client reconnects (to another worker) after SSE_RETRY_MS.
+                break
+            yield sse_message(delta["type"], delta)
+    finally:
+        change_feed.unsubscribe(user_email, queue)
+        logger.debug("Event feed closed for %s", user_email)
+
+
+@feed_router.get("/feed", summary="Server-sent events with changes to the caller's events")
+async def event_feed(user_email: str = Depends(get_current_user)):
+    """Stream ``invited``, ``event_deleted`` and ``rsvp_changed`` deltas for the caller.
+
+    Refetch the affected listing when one arrives; ``resync`` means deltas were
+    dropped and every listing should be refetched.
+    """
+    if get_settings().event_feed_mode == "off":
+        raise HTTPException(status_code=404, detail="The event feed is disabled")
+    if change_feed.closing:
+        raise HTTPException(status_code=503, detail="Server is shutting down. Please reconnect.")
+    try:
+        queue = await change_feed.subscribe(user_email)
+    except Exception as e:
+        logger.error("Error subscribing %s to the event feed: %s", user_email, e)
+        raise HTTPException(status_code=500, detail="Could not open the event feed. Please try again later.")
+
+    logger.info("Event feed opened for %s (mode=%s)", user_email, change_feed.mode)
+    return StreamingResponse(
+        _messages(user_email, queue),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,73 +1,26 @@
-print("response_routes.py LOADED")
-
-import os
 import logging
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from datetime import datetime
+from typing import Optional
 
 import database
 from models.event_model.event_model import EventResponse
-import utils.auth_utils as auth_utils
+from utils.dependencies import get_current_user
+from utils.response_counts import count_responses, counts_complete
+from repositories import get_attendee_repository
+from utils import etags, listing_cache
+from utils.etags import VERSION_PROJECTION
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-print("Loaded response_routes from:", os.path.abspath(__file__))
-
 response_router = APIRouter()
 
 
-def get_current_user(Authorization: str = Header(None)):
-
-    try:
-        if not Authorization:
-            logger.warning("Missing Authorization header")
-            raise HTTPException(status_code=401, detail="Missing Authorization header")
-
-        if not Authorization.startswith("Bearer "):
-            logger.warning("Invalid Authorization header format")
-            raise HTTPException(status_code=401, detail="Invalid Authorization header format. Use 'Bearer <token>'")
-
-        token = Authorization.replace("Bearer ", "").strip()
-        
-        if not token:
-            logger.warning("Empty token provided")
-            raise HTTPException(status_code=401, detail="Token is required")
-
-        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=["HS256"])
-        user_email = payload.get("sub")
-
-        if not user_email:
-            logger.warning("Token payload missing 'sub' field")
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-
-        return user_email
-
-    except auth_utils.jwt.ExpiredSignatureError:
-        logger.warning("Token has expired")
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except auth_utils.jwt.JWTError as e:
-        logger.error(f"JWT decode error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in get_current_user: {str(e)}")
-        raise HTTPException(status_code=500, detail="Authentication error")
-
-
 def _get_events_collection():
-    try:
-        database.connect_to_mongo()
-        if database.events_collection is None:
-            logger.error("Events collection not initialized")
-            raise HTTPException(status_code=500, detail="Database connection failed. Please try again later.")
-        return database.events_collection
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database connection error")
+    if database.events_collection is None:
+        logger.error("Events collection not initialized")
+        raise HTTPException(status_code=500, detail="Database connection failed. Please try again later.")
+    return database.events_collection
 
 
 def _validate_event_id(event_id: str):
@@ -84,35 +37,72 @@ def _validate_event_id(event_id: str):
             raise HTTPException(status_code=400, detail="Event ID must be a positive integer starting from 1")
         return event_id_int
     except ValueError:
-        logger.warning(f"Invalid event ID format: {event_id}")
+        logger.warning("Invalid event ID format: %s", event_id)
         raise HTTPException(status_code=400, detail="Invalid event ID format. Event ID must be an integer.")
 
 
-def _get_event_by_id(events_collection, event_id: str):
+async def _get_event_by_id(events_collection, event_id: str, projection=None):
 
     try:
         event_id_int = _validate_event_id(event_id)
-        event = events_collection.find_one({"_id": event_id_int})
+        event = await events_collection.find_one({"_id": event_id_int}, projection)
         
         if not event:
-            logger.warning(f"Event not found: {event_id}")
+            logger.warning("Event not found: %s", event_id)
             raise HTTPException(status_code=404, detail="Event not found")
         
         return event
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving event: {str(e)}")
+        logger.error("Error retrieving event: %s", e)
         raise HTTPException(status_code=500, detail="Error retrieving event")
 
 
+def _require_organizer(event, event_id: str, user_email: str):
+
+    organizer_email = event.get("organizer")
+    if not organizer_email:
+        logger.error("Event %s has no organizer", event_id)
+        raise HTTPException(status_code=500, detail="Event data is corrupted: missing organizer")
+    
+    if organizer_email != user_email:
+        logger.warning("User %s attempted to view attendees for event %s (not organizer)", user_email, event_id)
+        raise HTTPException(
+            status_code=403, 
+            detail="Only the event organizer can view attendee responses"
+        )
+
+
+async def _raise_respond_rejection(events_collection, event_id: str, event_id_int: int, user_email: str):
+    """Work out why the RSVP update matched nothing, reading only the caller's attendee entry."""
+
+    event = await events_collection.find_one({"_id": event_id_int}, {"organizer": 1})
+    
+    if not event:
+        logger.warning("Event not found: %s", event_id)
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    attendee = await get_attendee_repository().find_attendee(event_id_int, user_email) or {}
+    if event.get("organizer") == user_email or attendee.get("role") == "organizer":
+        logger.info("Organizer %s attempted to respond to event %s", user_email, event_id)
+        raise HTTPException(
+            status_code=400, 
+            detail="Organizers do not need to respond. They are automatically marked as attending."
+        )
+    
+    logger.warning("User %s is not an attendee of event %s", user_email, event_id)
+    raise HTTPException(
+        status_code=403, 
+        detail="You are not an attendee of this event. Please request an invitation first."
+    )
+
+
 @response_router.post("/{event_id}/respond")
-def respond_to_event(event_id: str, response: EventResponse, Authorization: str = Header(None)):
+async def respond_to_event(event_id: str, response: EventResponse, user_email: str = Depends(get_current_user)):
 
     try:
-        logger.info(f"POST /events/{event_id}/respond endpoint called")
-        
-        user_email = get_current_user(Authorization)
+        logger.info("POST /events/%s/respond endpoint called", event_id)
         
         if not response or not response.response:
             raise HTTPException(status_code=400, detail="Response is required")
@@ -126,103 +116,89 @@ def respond_to_event(event_id: str, response: EventResponse, Authorization: str
         
         events_collection = _get_events_collection()
         
-        event = _get_event_by_id(events_collection, event_id)
-        
-        attendees = event.get("attendees", [])
-        if not attendees:
-            logger.warning(f"Event {event_id} has no attendees")
-            raise HTTPException(status_code=500, detail="Event has no attendees")
-        
-        attendee_index = -1
-        user_role = None
-        
-        for idx, attendee in enumerate(attendees):
-            if attendee.get("email") == user_email:
-                user_role = attendee.get("role", "attendee")
-                attendee_index = idx
-                break
-        
-        if user_role == "organizer":
-            logger.info(f"Organizer {user_email} attempted to respond to event {event_id}")
-            raise HTTPException(
-                status_code=400, 
-                detail="Organizers do not need to respond. They are automatically marked as attending."
-            )
-        
-        if attendee_index == -1:
-            logger.warning(f"User {user_email} is not an attendee of event {event_id}")
-            raise HTTPException(
-                status_code=403, 
-                detail="You are not an attendee of this event. Please request an invitation first."
-            )
+        event_id_int = _validate_event_id(event_id)
+        updated_at = datetime.utcnow()
         
         try:
-            attendees[attendee_index]["response"] = response.response
-            attendees[attendee_index]["response_updated_at"] = datetime.utcnow()
-            
-            event_id_int = _validate_event_id(event_id)
-            update_result = events_collection.update_one(
-                {"_id": event_id_int},
-                {"$set": {"attendees": attendees}}
+            # Stores the caller's entry, moves the counters and bumps the version
+            # (see the repository); the pre-update entry is returned.
+            previous = await get_attendee_repository().set_response(
+                event_id_int, user_email, response.response, updated_at
             )
-            
-            if update_result.matched_count == 0:
-                logger.error(f"Event {event_id} not found during update")
-                raise HTTPException(status_code=404, detail="Event not found")
-            
-            if update_result.modified_count == 0:
-                logger.warning(f"No changes made to event {event_id} - response may be the same")
-            
-            logger.info(f"User {user_email} set response '{response.response}' for event {event_id}")
-            return {
-                "message": f"Response '{response.response}' recorded successfully",
-                "event_id": event_id,
-                "response": response.response,
-                "updated_at": attendees[attendee_index]["response_updated_at"].isoformat() if isinstance(attendees[attendee_index]["response_updated_at"], datetime) else None
-            }
-            
-        except HTTPException:
-            raise
         except Exception as e:
-            logger.error(f"Error updating response in database: {str(e)}")
+            logger.error("Error updating response in database: %s", e)
             raise HTTPException(status_code=500, detail="Failed to update response. Please try again.")
+        
+        if previous is None:
+            await _raise_respond_rejection(events_collection, event_id, event_id_int, user_email)
+        
+        await listing_cache.invalidate_event(event_id_int)
+        
+        logger.info("User %s set response '%s' for event %s", user_email, response.response, event_id)
+        return {
+            "message": f"Response '{response.response}' recorded successfully",
+            "event_id": event_id,
+            "response": response.response,
+            "updated_at": updated_at.isoformat()
+        }
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in respond_to_event: {str(e)}")
+        logger.error("Unexpected error in respond_to_event: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
 
 
 @response_router.get("/{event_id}/attendees")
-def get_event_attendees(event_id: str, Authorization: str = Header(None)):
+async def get_event_attendees(
+    event_id: str,
+    response: Response,
+    user_email: str = Depends(get_current_user),
+    summary_only: bool = Query(False, description="Return only the response counters, without the attendee list"),
+    if_none_match: Optional[str] = Header(None)
+):
 
     try:
-        logger.info(f"GET /events/{event_id}/attendees endpoint called")
-        
-        user_email = get_current_user(Authorization)
+        logger.info("GET /events/%s/attendees endpoint called", event_id)
         
         events_collection = _get_events_collection()
+        variant = "summary" if summary_only else "full"
+        
+        if if_none_match:
+            # Conditional poll: check organizer and version only, before loading the attendees.
+            stamp = await _get_event_by_id(events_collection, event_id, {"organizer": 1, **VERSION_PROJECTION})
+            _require_organizer(stamp, event_id, user_email)
+            etag = etags.event_etag(stamp, variant)
+            if etags.matches(if_none_match, etag):
+                return etags.not_modified(etag)
+        
+        if summary_only:
+            event = await _get_event_by_id(
+                events_collection, event_id, {"organizer": 1, "title": 1, "response_counts": 1, **VERSION_PROJECTION}
+            )
+        else:
+            event = await _get_event_by_id(events_collection, event_id)
         
-        event = _get_event_by_id(events_collection, event_id)
-        
-        organizer_email = event.get("organizer")
-        if not organizer_email:
-            logger.error(f"Event {event_id} has no organizer")
-            raise HTTPException(status_code=500, detail="Event data is corrupted: missing organizer")
+        _require_organizer(event, event_id, user_email)
+        response.headers["ETag"] = etags.event_etag(event, variant)
         
-        if organizer_email != user_email:
-            logger.warning(f"User {user_email} attempted to view attendees for event {event_id} (not organizer)")
-            raise HTTPException(
-                status_code=403, 
-                detail="Only the event organizer can view attendee responses"
-            )
+        if summary_only:
+            response_summary = event.get("response_counts")
+            if not counts_complete(response_summary):
+                # Created before counters existed and not recounted yet; fall back to the attendee list.
+                response_summary = count_responses(await get_attendee_repository().list_attendees(event))
+            return {
+                "event_id": event_id,
+                "event_title": event.get("title", "Unknown"),
+                "total_attendees": sum(response_summary.values()),
+                "response_summary": response_summary
+            }
         
         attendees_list = []
-        attendees_data = event.get("attendees", [])
+        attendees_data = await get_attendee_repository().list_attendees(event)
         
         if not attendees_data:
-            logger.info(f"Event {event_id} has no attendees")
+            logger.info("Event %s has no attendees", event_id)
             return {
                 "event_id": event_id,
                 "event_title": event.get("title", "Unknown"),
@@ -240,7 +216,7 @@ def get_event_attendees(event_id: str, Authorization: str = Header(None)):
             try:
                 attendee_email = attendee.get("email")
                 if not attendee_email:
-                    logger.warning(f"Attendee entry missing email in event {event_id}")
+                    logger.warning("Attendee entry missing email in event %s", event_id)
                     continue
                 
                 attendee_info = {
@@ -255,17 +231,12 @@ def get_event_attendees(event_id: str, Authorization: str = Header(None)):
                 
                 attendees_list.append(attendee_info)
             except Exception as e:
-                logger.warning(f"Error processing attendee entry: {str(e)}")
+                logger.warning("Error processing attendee entry: %s", e)
                 continue
         
-        response_summary = {
-            "Going": sum(1 for a in attendees_list if a.get("response") == "Going"),
-            "Maybe": sum(1 for a in attendees_list if a.get("response") == "Maybe"),
-            "Not Going": sum(1 for a in attendees_list if a.get("response") == "Not Going"),
-            "No Response": sum(1 for a in attendees_list if a.get("response") == "No Response")
-        }
+        response_summary = count_responses(attendees_list)
         
-        logger.info(f"Retrieved {len(attendees_list)} attendees for event {event_id}")
+        logger.info("Retrieved %s attendees for event %s", len(attendees_list), event_id)
         return {
             "event_id": event_id,
             "event_title": event.get("title", "Unknown"),
@@ -277,6 +248,6 @@ def get_event_attendees(event_id: str, Authorization: str = Header(None)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in get_event_attendees: {str(e)}")
+        logger.error("Unexpected error in get_event_attendees: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
 
@@ -1,158 +1,38 @@
-print("search_routes.py LOADED")
-
-import os
 import logging
-import re
-from fastapi import APIRouter, HTTPException, Header, Query
-from typing import Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from pydantic import ValidationError
+from typing import Literal, Optional
 
 import database
-import utils.auth_utils as auth_utils
+from models.event_model.event_model import EventDateRange
+from utils.dependencies import get_current_user
+from utils.event_dates import local_day_filter
+from utils.serializers import ORJSONResponse, viewer_stages
+from utils.pagination import MAX_PAGE_SIZE, aggregate_page, aggregate_pipeline
+from utils.streaming import ndjson_response, wants_ndjson
+from repositories import get_attendee_repository
+from utils.search_index import keyword_filter
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-print("Loaded search_routes from:", os.path.abspath(__file__))
-
 search_router = APIRouter()
 
 
-def get_current_user(Authorization: str = Header(None)):
-
-    try:
-        if not Authorization:
-            logger.warning("Missing Authorization header")
-            raise HTTPException(status_code=401, detail="Missing Authorization header")
-
-        if not Authorization.startswith("Bearer "):
-            logger.warning("Invalid Authorization header format")
-            raise HTTPException(status_code=401, detail="Invalid Authorization header format. Use 'Bearer <token>'")
-
-        token = Authorization.replace("Bearer ", "").strip()
-        
-        if not token:
-            logger.warning("Empty token provided")
-            raise HTTPException(status_code=401, detail="Token is required")
-
-        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=["HS256"])
-        user_email = payload.get("sub")
-
-        if not user_email:
-            logger.warning("Token payload missing 'sub' field")
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-
-        return user_email
-
-    except auth_utils.jwt.ExpiredSignatureError:
-        logger.warning("Token has expired")
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except auth_utils.jwt.JWTError as e:
-        logger.error(f"JWT decode error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in get_current_user: {str(e)}")
-        raise HTTPException(status_code=500, detail="Authentication error")
-
-
 def _get_events_collection():
 
-    try:
-        database.connect_to_mongo()
-        if database.events_collection is None:
-            logger.error("Events collection not initialized")
-            raise HTTPException(status_code=500, detail="Database connection failed. Please try again later.")
-        return database.events_collection
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database connection error")
+    if database.events_collection is None:
+        logger.error("Events collection not initialized")
+        raise HTTPException(status_code=500, detail="Database connection failed. Please try again later.")
+    return database.events_collection
 
 
-def _serialize_event(event_doc, user_email: str):
+def _parse_date_range(start_date: Optional[str], end_date: Optional[str]) -> EventDateRange:
 
     try:
-        event_copy = {**event_doc}
-        
-        if "_id" in event_copy:
-            event_copy["id"] = event_copy.pop("_id")
-        elif "id" not in event_copy:
-            event_copy["id"] = event_copy.get("event_id")
-
-        user_role = "attendee"
-        user_response = None
-        if event_copy.get("organizer") == user_email:
-            user_role = "organizer"
-        else:
-            for attendee in event_copy.get("attendees", []):
-                if attendee.get("email") == user_email:
-                    user_role = attendee.get("role", "attendee")
-                    user_response = attendee.get("response")
-                    break
-
-        event_copy["user_role"] = user_role
-        event_copy["is_organizer"] = event_copy.get("organizer") == user_email
-        event_copy["user_response"] = user_response
-        
-        if event_copy.get("attendees"):
-            for attendee in event_copy["attendees"]:
-                if attendee.get("email") == user_email:
-                    attendee["my_response"] = attendee.get("response")
-                    break
-        
-        return event_copy
-    except Exception as e:
-        logger.error(f"Error serializing event: {str(e)}")
-        event_copy = {**event_doc}
-        if "_id" in event_copy:
-            event_copy["id"] = event_copy.pop("_id")
-        return event_copy
-
-
-def _validate_date_format(date_str: str, field_name: str):
-
-    if not date_str or not isinstance(date_str, str):
-        raise HTTPException(status_code=400, detail=f"{field_name} must be a string")
-    
-    date_str = date_str.strip()
-    if not date_str:
-        raise HTTPException(status_code=400, detail=f"{field_name} cannot be empty")
-    
-    date_pattern = r'^\d{4}-\d{2}-\d{2}$'
-    if not re.match(date_pattern, date_str):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"{field_name} must be in YYYY-MM-DD format (e.g., 2024-12-25)"
-        )
-    
-    try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"{field_name} is not a valid date. Use YYYY-MM-DD format."
-        )
-    
-    return date_str
-
-
-def _validate_date_range(start_date: Optional[str], end_date: Optional[str]):
-
-    if start_date and end_date:
-        try:
-            start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = datetime.strptime(end_date, "%Y-%m-%d")
-            
-            if start > end:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="start_date must be before or equal to end_date"
-                )
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format")
+        return EventDateRange(start_date=start_date, end_date=end_date)
+    except ValidationError as e:
+        message = e.errors()[0]["msg"].removeprefix("Value error, ")
+        raise HTTPException(status_code=400, detail=message)
 
 
 def _validate_role(role: Optional[str]):
@@ -183,36 +63,31 @@ def _sanitize_keyword(keyword: str):
 
 
 @search_router.get("/search")
-def search_events(
-    Authorization: str = Header(None),
-    keyword: Optional[str] = Query(None, description="Search in event title and description (case-insensitive)"),
-    start_date: Optional[str] = Query(None, description="Filter events from this date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="Filter events until this date (YYYY-MM-DD)"),
-    role: Optional[str] = Query(None, description="Filter by user role: 'organizer' or 'attendee'")
+async def search_events(
+    user_email: str = Depends(get_current_user),
+    keyword: Optional[str] = Query(None, description="Search in event title and description; results are ranked by relevance"),
+    start_date: Optional[str] = Query(None, description="Filter events on or after this date in the event's own timezone (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Filter events on or before this date in the event's own timezone (YYYY-MM-DD)"),
+    role: Optional[str] = Query(None, description="Filter by user role: 'organizer' or 'attendee'"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor value from the previous page"),
+    fields: Literal["full", "summary"] = Query("full", description="'full' includes only your own attendee entry; 'summary' omits the attendees array"),
+    accept: Optional[str] = Header(None)
 ):
 
     try:
         logger.info("/events/search endpoint called")
         
-        user_email = get_current_user(Authorization)
-        
         validated_keyword = None
         if keyword:
             validated_keyword = _sanitize_keyword(keyword)
         
-        validated_start_date = None
-        if start_date:
-            validated_start_date = _validate_date_format(start_date, "start_date")
-        
-        validated_end_date = None
-        if end_date:
-            validated_end_date = _validate_date_format(end_date, "end_date")
-        
-        _validate_date_range(validated_start_date, validated_end_date)
+        date_range = _parse_date_range(start_date or None, end_date or None)
         
         validated_role = _validate_role(role)
         
         events_collection = _get_events_collection()
+        repository = get_attendee_repository()
         
         query = {}
         
@@ -220,23 +95,18 @@ def search_events(
             if validated_role == "organizer":
                 query["organizer"] = user_email
             elif validated_role == "attendee":
-                query["attendees.email"] = user_email
+                query.update(await repository.member_filter(user_email))
                 query["organizer"] = {"$ne": user_email}
         except Exception as e:
-            logger.error(f"Error building role query: {str(e)}")
+            logger.error("Error building role query: %s", e)
             raise HTTPException(status_code=500, detail="Error building search query")
         
+        keyword_projection, keyword_sort, keyword_scores = None, None, None
         if validated_keyword:
             try:
-                escaped_keyword = re.escape(validated_keyword)
-                keyword_query = {
-                    "$or": [
-                        {"title": {"$regex": escaped_keyword, "$options": "i"}},
-                        {"description": {"$regex": escaped_keyword, "$options": "i"}}
-                    ]
-                }
+                keyword_query, keyword_projection, keyword_sort, keyword_scores = keyword_filter(validated_keyword)
                 
-                if "$or" in query:
+                if any(key in query for key in keyword_query):
                     query = {
                         "$and": [
                             query,
@@ -246,53 +116,58 @@ def search_events(
                 else:
                     query.update(keyword_query)
             except Exception as e:
-                logger.error(f"Error building keyword query: {str(e)}")
+                logger.error("Error building keyword query: %s", e)
                 raise HTTPException(status_code=500, detail="Error processing keyword search")
         
-        if validated_start_date or validated_end_date:
+        if date_range.start_date or date_range.end_date:
             try:
-                date_query = {}
-                if validated_start_date:
-                    date_query["$gte"] = validated_start_date
-                if validated_end_date:
-                    date_query["$lte"] = validated_end_date
-                
-                if date_query:
-                    query["date"] = date_query
+                query.update(local_day_filter(date_range.start_date, date_range.end_date))
             except Exception as e:
-                logger.error(f"Error building date query: {str(e)}")
+                logger.error("Error building date query: %s", e)
                 raise HTTPException(status_code=500, detail="Error processing date filter")
         
+        # Mongo filters, sorts and limits, then computes the viewer's role/response
+        # and drops everyone else's attendee entries, so results come back ready to send.
+        stages = repository.viewer_stages(user_email) + viewer_stages(user_email, fields, keyword_projection)
+
+        if wants_ndjson(accept):
+            logger.info("Streaming search results for user %s", user_email)
+            return ndjson_response(
+                events_collection.aggregate(aggregate_pipeline(query, stages, keyword_sort)),
+                lambda ev: ev
+            )
+
         try:
-            events = list(events_collection.find(query))
+            serialized_events, next_cursor = await aggregate_page(
+                events_collection, query, limit, cursor, stages, keyword_sort
+            )
+            if keyword_scores is not None and limit is None and cursor is None:
+                for ev in serialized_events:
+                    ev["score"] = keyword_scores.get(ev["id"], 0)
+                serialized_events.sort(key=lambda ev: ev["score"], reverse=True)
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error executing database query: {str(e)}")
+            logger.error("Error executing database query: %s", e)
             raise HTTPException(status_code=500, detail="Error executing search query. Please try again.")
         
-        serialized_events = []
-        for ev in events:
-            try:
-                serialized_events.append(_serialize_event(ev, user_email))
-            except Exception as e:
-                logger.warning(f"Error serializing event {ev.get('_id', ev.get('id', 'unknown'))}: {str(e)}")
-                continue
-        
-        logger.info(f"Search returned {len(serialized_events)} events for user {user_email}")
+        logger.info("Search returned %s events for user %s", len(serialized_events), user_email)
         
-        return {
+        return ORJSONResponse({
             "results": serialized_events,
             "count": len(serialized_events),
+            "next_cursor": next_cursor,
             "filters_applied": {
                 "keyword": validated_keyword if validated_keyword else None,
-                "start_date": validated_start_date,
-                "end_date": validated_end_date,
+                "start_date": date_range.start_date.isoformat() if date_range.start_date else None,
+                "end_date": date_range.end_date.isoformat() if date_range.end_date else None,
                 "role": validated_role
             }
-        }
+        })
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in search_events: {str(e)}")
+        logger.error("Unexpected error in search_events: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred during search. Please try again later.")
 
@@ -1,15 +1,29 @@
 from fastapi import APIRouter
 import database  # note: import the module, not the variable
+import utils.password_pool as password_pool
 
 test_router = APIRouter()
 
 @test_router.get("/test-db", summary="Test Db")
-def test_db():
-    database.connect_to_mongo()
-
-    result = database.users_collection.insert_one({
+async def test_db():
+    result = await database.users_collection.insert_one({
         "name": "DB Test User",
         "status": "connected"
     })
 
     return {"inserted_id": str(result.inserted_id)}
+
+
+@test_router.get("/db-indexes", summary="Expected vs existing indexes")
+async def db_indexes():
+    return await database.index_report()
+
+
+@test_router.get("/password-pool-stats", summary="Password hashing pool metrics")
+async def password_pool_stats():
+    return password_pool.stats()
+
+
+@test_router.get("/db-pool-stats", summary="MongoDB connection pool statistics")
+async def db_pool_stats():
+    return database.pool_stats()
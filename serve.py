@@ -0,0 +1,347 @@
+"""Production entry point: a pre-forking supervisor around uvicorn workers.
+
+    WEB_CONCURRENCY=4 HOST=0.0.0.0 PORT=8000 python serve.py
+
+The master binds the listening socket, imports ``main`` once (so workers fork
+with the app already loaded) and then forks ``WEB_CONCURRENCY`` workers, by
+default one per available core. Each worker opens its own Mongo client in the
+app lifespan, after the fork. Per-worker pool sizes are derived from process
+totals so adding workers does not multiply connections to Mongo or bcrypt
+processes:
+
+- ``MONGO_MAX_CONNECTIONS`` (default 100) is split into ``MONGO_MAX_POOL_SIZE``
+  per worker, unless MONGO_MAX_POOL_SIZE is set explicitly.
+- ``PASSWORD_POOL_SIZE`` defaults to cores / workers instead of cores.
+
+Per-process state doesn't survive being split across workers, so with more
+than one worker:
+
+- a ``memory`` listing cache is switched off (a write handled by one worker
+  wouldn't invalidate the others' copies); use LISTING_CACHE_BACKEND=redis to
+  keep caching.
+- ``SEARCH_BACKEND=memory`` is replaced by ``text`` (each worker's index would
+  miss the events created through the others).
+- ``memory`` rate-limit buckets get 1/workers of each budget
+  (RATE_LIMIT_PROCESSES); connections aren't spread perfectly evenly, so use
+  RATE_LIMIT_BACKEND=redis where the budgets must be exact.
+
+These per-worker values are recomputed whenever the worker count changes.
+
+The settings are validated in the master before forking, so a bad
+configuration fails once instead of in every worker. A worker that exits
+before finishing startup stops the whole server (exit status 3); workers that
+die later are replaced, with an increasing delay while they keep dying.
+
+Signals sent to the master:
+
+- SIGTERM / SIGINT: workers stop accepting, finish in-flight requests (up to
+  ``GRACEFUL_TIMEOUT`` seconds) and exit; stragglers are then killed.
+- SIGHUP: rolling restart. A replacement is forked before each old worker is
+  drained, so the socket is never left without a worker. Workers come back
+  with fresh Mongo clients and caches but the same preloaded code; redeploy
+  the container to ship new code.
+- SIGTTIN / SIGTTOU: one more / one fewer worker. The per-worker settings
+  are derived again for the new count and every worker is replaced with a
+  rolling restart, so the pools and rate-limit shares add up to the totals.
+
+uvloop and httptools are used when installed (``uvicorn[standard]``), otherwise
+uvicorn falls back to asyncio and h11. Platforms without ``os.fork`` run a
+single in-process server.
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from config import get_settings, load_environment
+
+logger = logging.getLogger("serve")
+
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+MONGO_MAX_CONNECTIONS = int(os.getenv("MONGO_MAX_CONNECTIONS", "100"))
+
+# Exit status of a worker (and of serve.py) when the app fails to start, as in uvicorn.
+STARTUP_FAILURE = 3
+# Unexpected worker exits within this many seconds count towards the respawn delay.
+CRASH_WINDOW = 60
+MAX_RESPAWN_DELAY = 30
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count():
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return available_cores()
+
+
+# Derived from the worker count by size_workers, unless set in the environment.
+PER_WORKER_SETTINGS = ("MONGO_MAX_POOL_SIZE", "PASSWORD_POOL_SIZE", "RATE_LIMIT_PROCESSES")
+
+
+def size_workers(workers: int, explicit=frozenset()):
+    """Set per-worker pool sizes and rate-limit shares in the environment workers inherit."""
+    derived = {
+        "MONGO_MAX_POOL_SIZE": max(1, MONGO_MAX_CONNECTIONS // workers),
+        "PASSWORD_POOL_SIZE": max(1, available_cores() // workers),
+        # Only read with RATE_LIMIT_BACKEND=memory.
+        "RATE_LIMIT_PROCESSES": workers,
+    }
+    for name, value in derived.items():
+        if name not in explicit:
+            os.environ[name] = str(value)
+
+
+def share_state(workers: int):
+    """Switch off per-process caches that can't be shared across several workers."""
+    if workers == 1:
+        return
+    if os.getenv("LISTING_CACHE_BACKEND", "memory").strip().lower() == "memory":
+        logger.warning("The memory listing cache is per process; disabling it for %s workers "
+                       "(set LISTING_CACHE_BACKEND=redis to cache across workers)", workers)
+        os.environ["LISTING_CACHE_BACKEND"] = "off"
+    if os.getenv("SEARCH_BACKEND", "text").strip().lower() == "memory":
+        logger.warning("The memory search index is per process; using SEARCH_BACKEND=text for %s workers", workers)
+        os.environ["SEARCH_BACKEND"] = "text"
+
+
+def _loop_and_http():
+    loop, http = "asyncio", "h11"
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        pass
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        pass
+    return loop, http
+
+
+class _Server(uvicorn.Server):
+    async def shutdown(self, sockets=None):
+        # uvicorn waits for open connections before the lifespan shutdown runs, so
+        # the long-lived /events/feed streams are told to end here instead of
+        # holding the worker until GRACEFUL_TIMEOUT.
+        from utils.change_feed import change_feed
+
+        change_feed.close()
+        await super().shutdown(sockets=sockets)
+
+
+def _server(app):
+    loop, http = _loop_and_http()
+    config = uvicorn.Config(
+        app,
+        host=HOST,
+        port=PORT,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        backlog=BACKLOG,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        # The app's own logging setup (utils/logging_config.py) handles uvicorn's loggers.
+        log_config=None,
+    )
+    return _Server(config)
+
+
+def _bind():
+    sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    def __init__(self, app, sock, workers: int, explicit=frozenset()):
+        self.app = app
+        self.sock = sock
+        self.explicit = explicit
+        self.target = workers
+        self.sized_for = workers
+        self.workers = set()
+        self.draining = {}
+        self.stopping = False
+        self.reload_requested = False
+        self.exit_code = 0
+        self.crashes = []
+        self.respawn_at = 0.0
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                signal.signal(signum, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                server = _server(self.app)
+                server.run(sockets=[self.sock])
+                if not server.started:
+                    exit_code = STARTUP_FAILURE
+            except SystemExit as e:
+                # uvicorn exits with STARTUP_FAILURE when the lifespan fails.
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception("Worker %s crashed", os.getpid())
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.workers.add(pid)
+        logger.info("Started worker %s", pid)
+        return pid
+
+    def _drain(self, pid):
+        self.workers.discard(pid)
+        self.draining[pid] = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.draining.pop(pid, None)
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def _on_scale(self, signum, frame):
+        self.target = self.target + 1 if signum == signal.SIGTTIN else max(1, self.target - 1)
+
+    def _resize(self):
+        """Derive the per-worker settings for the new target and roll every worker onto them."""
+        size_workers(self.target, self.explicit)
+        # Workers fork with the master's cached settings.
+        get_settings.cache_clear()
+        get_settings()
+        logger.info("Scaling from %s to %s workers (mongo pool/worker=%s)",
+                    self.sized_for, self.target, os.environ["MONGO_MAX_POOL_SIZE"])
+        self.sized_for = self.target
+        self.reload_requested = True
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if os.WIFEXITED(status) and os.WEXITSTATUS(status) == STARTUP_FAILURE:
+                    # Every replacement would fail the same way.
+                    logger.error("Worker %s failed to start, shutting down", pid)
+                    self.exit_code = STARTUP_FAILURE
+                    self.stopping = True
+                else:
+                    logger.warning("Worker %s exited unexpectedly (status %s)", pid, status)
+                    self._delay_respawn()
+            self.draining.pop(pid, None)
+
+    def _delay_respawn(self):
+        now = time.monotonic()
+        self.crashes = [at for at in self.crashes if now - at < CRASH_WINDOW] + [now]
+        if len(self.crashes) > 1:
+            delay = min(MAX_RESPAWN_DELAY, 2 ** (len(self.crashes) - 2))
+            logger.warning("%s workers died in the last %ss, respawning in %ss", len(self.crashes), CRASH_WINDOW, delay)
+            self.respawn_at = max(self.respawn_at, now + delay)
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.draining.items()):
+            if now >= deadline:
+                logger.warning("Worker %s did not drain within %ss, killing it", pid, GRACEFUL_TIMEOUT)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.draining[pid] = float("inf")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTTIN, self._on_scale)
+        signal.signal(signal.SIGTTOU, self._on_scale)
+
+        while not self.stopping:
+            self._reap()
+            if self.stopping:
+                break
+            if self.target != self.sized_for:
+                self._resize()
+            if self.reload_requested:
+                self.reload_requested = False
+                logger.info("Rolling restart of %s workers", len(self.workers))
+                for pid in list(self.workers):
+                    self._spawn()
+                    self._drain(pid)
+            while len(self.workers) < self.target and time.monotonic() >= self.respawn_at:
+                self._spawn()
+            while len(self.workers) > self.target:
+                self._drain(next(iter(self.workers)))
+            self._kill_overdue()
+            time.sleep(0.2)
+
+        logger.info("Shutting down, draining %s workers", len(self.workers))
+        for pid in list(self.workers):
+            self._drain(pid)
+        while self.draining:
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.1)
+        self.sock.close()
+        return self.exit_code
+
+
+def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(name)s %(message)s")
+    # .env first, so values set there take part in sizing; workers inherit the environment.
+    load_environment()
+    explicit = frozenset(name for name in PER_WORKER_SETTINGS if name in os.environ)
+    workers = worker_count()
+    size_workers(workers, explicit)
+    share_state(workers)
+
+    try:
+        get_settings()
+    except ValueError as e:
+        logger.error("Invalid configuration: %s", e)
+        return STARTUP_FAILURE
+
+    from main import app
+
+    if workers == 1 or not hasattr(os, "fork"):
+        server = _server(app)
+        server.run()
+        return 0 if server.started else STARTUP_FAILURE
+
+    sock = _bind()
+    loop, http = _loop_and_http()
+    logger.info(
+        "Serving on %s:%s with %s workers (loop=%s, http=%s, mongo pool/worker=%s)",
+        HOST, PORT, workers, loop, http, os.environ["MONGO_MAX_POOL_SIZE"]
+    )
+    return Supervisor(app, sock, workers, explicit).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
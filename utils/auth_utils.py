@@ -1,50 +1,51 @@
-import os
 import logging
-from passlib.context import CryptContext
-from jose import jwt
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-load_dotenv()
+from config import get_settings
 
-SECRET_KEY = os.getenv("SECRET_KEY")
+logger = logging.getLogger(__name__)
 
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY missing from .env file")
+# passlib (and its bcrypt backend) and jose are imported on first use, so
+# importing the app doesn't pay for them.
+_pwd_context = None
+_jwt = None
 
-SECRET_KEY = SECRET_KEY.strip()
-print("auth_utils loaded, SECRET_KEY =", SECRET_KEY, "| type:", type(SECRET_KEY))
 
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+def pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# logger = logging.getLogger("auth_utils")
-# if not logger.handlers:
-#     handler = logging.StreamHandler()
-#     formatter = logging.Formatter("[%(asctime)s] %(levelname)s %(name)s: %(message)s")
-#     handler.setFormatter(formatter)
-#     logger.addHandler(handler)
-# logger.setLevel(logging.INFO)
+def jwt():
+    global _jwt
+    if _jwt is None:
+        from jose import jwt as jose_jwt
+        _jwt = jose_jwt
+    return _jwt
 
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict):
-    print("⚡ create_access_token CALLED")
+    settings = get_settings()
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     to_encode.update({"exp": expire})
 
-    print("DEBUG SECRET_KEY =", SECRET_KEY, "| type:", type(SECRET_KEY))
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    # logger.info(f"JWT generated for {data.get('sub')}: {token}")
-    print("Token created successfully!")
+    token = jwt().encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    logger.debug("JWT generated for %s", data.get("sub"))
     return token
+
+
+def decode_access_token(token: str):
+    settings = get_settings()
+    return jwt().decode(token, settings.secret_key, algorithms=[settings.algorithm])
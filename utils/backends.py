@@ -0,0 +1,45 @@
+"""Stores chosen by a ``*_BACKEND`` setting: ``memory``, ``redis`` or ``off``.
+
+The listing cache and the rate limiter both build theirs on first use, so the
+settings are read in the worker rather than at import, and both let tests swap
+in a fake.
+"""
+from config import get_settings
+
+_UNSET = object()
+
+
+class ConfiguredBackend:
+    """The store selected by ``settings.<setting>``, built on first use.
+
+    ``memory`` is called for the in-process store; ``redis`` wraps a client for
+    REDIS_URL (the client itself by default). ``off`` gives None.
+    """
+
+    def __init__(self, setting: str, memory, redis=None):
+        self.setting = setting
+        self.memory = memory
+        self.redis = redis or (lambda client: client)
+        self._value = _UNSET
+
+    def get(self):
+        if self._value is _UNSET:
+            self._value = self._build()
+        return self._value
+
+    def set(self, value):
+        """Swap the store (e.g. for a fake in tests); None disables it."""
+        self._value = value
+
+    def _build(self):
+        settings = get_settings()
+        choice = getattr(settings, self.setting)
+        if choice == "off":
+            return None
+        if choice == "redis":
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                raise RuntimeError(f"{self.setting.upper()}=redis requires the 'redis' package")
+            return self.redis(redis_asyncio.Redis.from_url(settings.redis_url))
+        return self.memory()
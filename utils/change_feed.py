@@ -0,0 +1,304 @@
+"""Per-user change feed behind GET /events/feed.
+
+One background task per process turns database changes into per-user deltas
+and fans them out to the queues of the connections subscribed in this process:
+
+invited         {"type": "invited", "event_id": 7}                          to the invited user
+event_deleted   {"type": "event_deleted", "event_id": 7}                    to every member of the event
+rsvp_changed    {"type": "rsvp_changed", "event_id": 7, "response_counts": {...}}
+                                                                             to the organizer, whenever the
+                                                                             event's response counts change
+resync          {"type": "resync"}   the connection fell behind and its backlog was dropped; refetch listings
+
+EVENT_FEED_MODE selects the source:
+
+auto          (default) change stream, or polling if the server has no change streams (standalone mongod)
+changestream  one change stream per process on events and event_attendees; sees every worker's writes
+poll          every EVENT_FEED_POLL_INTERVAL seconds, re-read the memberships of the users subscribed
+              here and diff them against the previous read
+off           no feed; the endpoint answers 404
+
+Deltas only say what changed; clients refetch the affected listing or event.
+Delete notifications in change-stream mode need pre-images (MongoDB 6.0+),
+which the feed enables on both collections when it starts.
+"""
+import asyncio
+import logging
+import re
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import database
+from config import get_settings
+from repositories import get_attendee_repository
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("events", "event_attendees")
+RESYNC = {"type": "resync"}
+# Queued by close(): the connection should end so the server can stop.
+CLOSE = {"type": "close"}
+# Subscribed users per membership query when polling.
+POLL_BATCH = 500
+
+# "$changeStream stage is only supported on replica sets"
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+_ATTENDEE_INDEX_FIELD = re.compile(r"^attendees\.\d+$")
+
+# Only what deltas_from_change reads is sent back by the server.
+_PIPELINE = [
+    {"$match": {
+        "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+        "operationType": {"$in": ["insert", "update", "delete"]}
+    }},
+    {"$project": {
+        "operationType": 1,
+        "ns": 1,
+        "documentKey": 1,
+        "updateDescription.updatedFields": 1,
+        "fullDocument.event_id": 1,
+        "fullDocument.email": 1,
+        "fullDocument.role": 1,
+        "fullDocument.organizer": 1,
+        "fullDocument.response_counts": 1,
+        "fullDocumentBeforeChange.event_id": 1,
+        "fullDocumentBeforeChange.email": 1,
+        "fullDocumentBeforeChange.attendees.email": 1,
+    }}
+]
+
+metrics.describe("event_feed_subscribers", "gauge", "Open /events/feed connections in this process.")
+metrics.describe("event_feed_deltas_total", "counter", "Deltas delivered to feed connections, by type.")
+metrics.describe("event_feed_resyncs_total", "counter", "Feed connections whose backlog overflowed and was dropped.")
+
+
+def _invited(event_id, entry):
+    if isinstance(entry, dict) and entry.get("email") and entry.get("role", "attendee") != "organizer":
+        return [(entry["email"], {"type": "invited", "event_id": event_id})]
+    return []
+
+
+def deltas_from_change(change):
+    """Map one change stream document to (email, delta) pairs."""
+    collection = change["ns"]["coll"]
+    operation = change["operationType"]
+    after = change.get("fullDocument") or {}
+    before = change.get("fullDocumentBeforeChange") or {}
+
+    if collection == "event_attendees":
+        if operation == "insert":
+            return _invited(after.get("event_id"), after)
+        if operation == "delete" and before.get("email"):
+            return [(before["email"], {"type": "event_deleted", "event_id": before.get("event_id")})]
+        return []
+
+    event_id = change["documentKey"]["_id"]
+    if operation == "delete":
+        # Embedded layout only; in the collection layout each membership's own delete reports it.
+        emails = {a["email"] for a in before.get("attendees", []) if a.get("email")}
+        return [(email, {"type": "event_deleted", "event_id": event_id}) for email in emails]
+    if operation != "update":
+        return []
+
+    deltas = []
+    counts_changed = False
+    for field, value in (change.get("updateDescription") or {}).get("updatedFields", {}).items():
+        if _ATTENDEE_INDEX_FIELD.match(field):
+            # $push reports each appended entry as attendees.<index>.
+            deltas += _invited(event_id, value)
+        elif field == "attendees" and isinstance(value, list) and "attendees" in before:
+            known = {a.get("email") for a in before["attendees"]}
+            for entry in value:
+                if entry.get("email") not in known:
+                    deltas += _invited(event_id, entry)
+        elif field == "response_counts" or field.startswith("response_counts."):
+            counts_changed = True
+    if counts_changed and after.get("organizer"):
+        deltas.append((after["organizer"], {
+            "type": "rsvp_changed", "event_id": event_id, "response_counts": after.get("response_counts")
+        }))
+    return deltas
+
+
+def _change_streams_unsupported(error: OperationFailure):
+    return error.code == _CHANGE_STREAMS_UNSUPPORTED or "only supported on replica sets" in str(error)
+
+
+class ChangeFeed:
+    def __init__(self):
+        self.mode = None
+        self._subscribers = {}
+        self._snapshots = {}
+        self._task = None
+        self._resume_token = None
+        self.closing = False
+
+    async def subscribe(self, email: str):
+        """Register a connection for the user's deltas and return its queue."""
+        if self.closing:
+            raise RuntimeError("The event feed is shutting down")
+        queue = asyncio.Queue(maxsize=get_settings().event_feed_queue_size)
+        if self.mode == "poll" and email not in self._subscribers:
+            # Baseline now, so changes made between connecting and the next poll aren't missed.
+            await self._poll_users([email], publish=False)
+        self._subscribers.setdefault(email, set()).add(queue)
+        metrics.add_gauge("event_feed_subscribers", 1)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, email: str, queue):
+        queues = self._subscribers.get(email)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[email]
+            self._snapshots.pop(email, None)
+        metrics.add_gauge("event_feed_subscribers", -1)
+
+    def publish(self, email: str, delta: dict):
+        for queue in self._subscribers.get(email, ()):
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # A connection that can't keep up refetches instead of buffering without bound.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+                metrics.inc("event_feed_resyncs_total")
+                continue
+            metrics.inc("event_feed_deltas_total", type=delta["type"])
+
+    def _resync_all(self):
+        for email in list(self._subscribers):
+            self.publish(email, RESYNC)
+
+    def close(self):
+        """Tell every open connection to end, e.g. when the server starts draining."""
+        self.closing = True
+        for queues in self._subscribers.values():
+            for queue in queues:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSE)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.mode = None
+        self.closing = False
+
+    async def _run(self):
+        configured = get_settings().event_feed_mode
+        try:
+            if configured in ("auto", "changestream"):
+                try:
+                    await self._watch()
+                    return
+                except OperationFailure as e:
+                    if configured == "changestream":
+                        raise
+                    logger.warning("Change streams are not available (%s); the event feed falls back to polling", e)
+            await self._poll()
+        except Exception as e:
+            # Connected clients stop receiving deltas; the next subscriber starts a new attempt.
+            logger.error("Event feed stopped: %s", e)
+            self.mode = None
+
+    async def _enable_pre_images(self):
+        for name in WATCHED_COLLECTIONS:
+            try:
+                await database.db.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+            except PyMongoError as e:
+                logger.warning("Could not enable change stream pre-images on %s, deletes won't be reported: %s",
+                               name, e)
+
+    async def _watch(self):
+        """Follow the change stream, resuming after errors. Raises if the server has no change streams."""
+        first_attempt = True
+        failures = 0
+        while True:
+            try:
+                async with database.db.watch(
+                    _PIPELINE,
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=self._resume_token
+                ) as stream:
+                    if first_attempt:
+                        self.mode = "changestream"
+                        first_attempt = False
+                        await self._enable_pre_images()
+                    async for change in stream:
+                        failures = 0
+                        self._resume_token = stream.resume_token
+                        for email, delta in deltas_from_change(change):
+                            self.publish(email, delta)
+            except OperationFailure as e:
+                if first_attempt and _change_streams_unsupported(e):
+                    raise
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    # Changes were missed for good; start from now and have clients refetch.
+                    self._resume_token = None
+                    self._resync_all()
+                logger.error("Event feed change stream interrupted: %s", e)
+            except PyMongoError as e:
+                logger.error("Event feed change stream interrupted: %s", e)
+            failures += 1
+            await asyncio.sleep(min(30, 2 ** failures))
+
+    async def _poll(self):
+        self.mode = "poll"
+        interval = get_settings().event_feed_poll_interval
+        while True:
+            try:
+                await self._poll_users(list(self._subscribers), publish=True)
+            except PyMongoError as e:
+                logger.error("Event feed poll failed: %s", e)
+            await asyncio.sleep(interval)
+
+    async def _poll_users(self, emails: list, publish: bool):
+        repository = get_attendee_repository()
+        for start in range(0, len(emails), POLL_BATCH):
+            batch = emails[start:start + POLL_BATCH]
+            memberships = await repository.memberships(batch)
+            counts = {}
+            organized = database.events_collection.find(
+                {"organizer": {"$in": batch}}, {"organizer": 1, "response_counts": 1}
+            )
+            async for event in organized:
+                counts.setdefault(event["organizer"], {})[event["_id"]] = event.get("response_counts")
+
+            for email in batch:
+                current = (memberships.get(email, {}), counts.get(email, {}))
+                previous = self._snapshots.get(email)
+                self._snapshots[email] = current
+                if publish and previous is not None:
+                    for delta in _diff(previous, current):
+                        self.publish(email, delta)
+
+
+def _diff(previous, current):
+    """Deltas for one user between two (event_id -> role, event_id -> response_counts) reads."""
+    old_events, old_counts = previous
+    events, counts = current
+    for event_id, role in events.items():
+        if event_id not in old_events and role != "organizer":
+            yield {"type": "invited", "event_id": event_id}
+    for event_id in old_events.keys() - events.keys():
+        yield {"type": "event_deleted", "event_id": event_id}
+    for event_id, event_counts in counts.items():
+        if event_id in old_counts and old_counts[event_id] != event_counts:
+            yield {"type": "rsvp_changed", "event_id": event_id, "response_counts": event_counts}
+
+
+change_feed = ChangeFeed()
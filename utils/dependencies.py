@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Header, HTTPException, Request
+
+import utils.auth_utils as auth_utils
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# sha256(token) -> (email, exp). Only tokens that passed signature verification
+# are stored, and each entry is dropped once the token's own exp has passed.
+# Only touched from the event loop (get_current_user is async and does no I/O);
+# the lock keeps it safe for callers on other threads anyway.
+_verified_tokens = OrderedDict()
+_lock = threading.Lock()
+
+# Key in the request's scope["state"] under which authenticate_scope() leaves
+# (Authorization header, status code or None, detail or email).
+_AUTH_STATE = "authorization_check"
+
+
+def _token_key(token: str):
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _cached_subject(key):
+    with _lock:
+        entry = _verified_tokens.get(key)
+        if entry is None:
+            return None
+        email, exp = entry
+        if exp <= time.time():
+            _verified_tokens.pop(key, None)
+            return None
+        _verified_tokens.move_to_end(key)
+        return email
+
+
+def _remember(key, email: str, exp):
+    size = get_settings().token_cache_size
+    with _lock:
+        _verified_tokens[key] = (email, exp)
+        _verified_tokens.move_to_end(key)
+        while len(_verified_tokens) > size:
+            _verified_tokens.popitem(last=False)
+
+
+def clear_token_cache():
+    with _lock:
+        _verified_tokens.clear()
+
+
+async def get_current_user(request: Request, Authorization: str = Header(None)):
+    """Shared auth dependency: returns the email of the bearer token's subject.
+
+    Async so FastAPI runs it on the event loop instead of the threadpool. If
+    middleware already checked this header (authenticate_scope), its outcome is
+    reused instead of decoding and logging the token again.
+    """
+    checked = request.scope.get("state", {}).get(_AUTH_STATE)
+    if checked is not None and checked[0] == Authorization:
+        _, status_code, result = checked
+        if status_code is not None:
+            raise HTTPException(status_code=status_code, detail=result)
+        return result
+    return user_from_authorization(Authorization)
+
+
+def authenticate_scope(scope, authorization: str):
+    """user_from_authorization for middleware; the outcome is kept on the request for get_current_user."""
+    state = scope.setdefault("state", {})
+    try:
+        user_email = user_from_authorization(authorization)
+    except HTTPException as e:
+        state[_AUTH_STATE] = (authorization, e.status_code, e.detail)
+        raise
+    state[_AUTH_STATE] = (authorization, None, user_email)
+    return user_email
+
+
+def user_from_authorization(Authorization: str):
+    """Email of the bearer token's subject; raises HTTPException(401) for a bad header or token."""
+
+    if not Authorization:
+        logger.warning("Missing Authorization header")
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+
+    if not Authorization.startswith("Bearer "):
+        logger.warning("Invalid Authorization header format")
+        raise HTTPException(status_code=401, detail="Invalid Authorization header format. Use 'Bearer <token>'")
+
+    token = Authorization[len("Bearer "):].strip()
+
+    if not token:
+        logger.warning("Empty token provided")
+        raise HTTPException(status_code=401, detail="Token is required")
+
+    key = _token_key(token)
+    user_email = _cached_subject(key)
+    if user_email:
+        return user_email
+
+    jwt = auth_utils.jwt()
+    try:
+        payload = auth_utils.decode_access_token(token)
+    except jwt.ExpiredSignatureError:
+        logger.warning("Token has expired")
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.JWTError as e:
+        logger.error("JWT decode error: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid token")
+    except Exception as e:
+        logger.error("Unexpected error in get_current_user: %s", e)
+        raise HTTPException(status_code=500, detail="Authentication error")
+
+    user_email = payload.get("sub")
+    if not user_email:
+        logger.warning("Token payload missing 'sub' field")
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    if payload.get("exp") is not None:
+        _remember(key, user_email, payload["exp"])
+    return user_email
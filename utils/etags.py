@@ -0,0 +1,46 @@
+"""Strong ETags derived from per-event versions.
+
+Every write to an event (create, invite, respond, counter repair) bumps its
+``version`` field with ``$inc``; a deleted event simply drops out of listing
+hashes. An event response's ETag is built from the event id and version, and a
+listing's ETag hashes the ``(id, version)`` pairs of the page. Either can be
+recomputed from a query that projects only ``_id``/``version``, so
+``If-None-Match`` is answered with a 304 without loading or serializing the
+full documents.
+"""
+import hashlib
+
+from fastapi import Response
+
+VERSION_FIELD = "version"
+VERSION_PROJECTION = {VERSION_FIELD: 1}
+
+
+def version_of(event_doc):
+    # Events written before versioning count as version 0 until their next write.
+    return event_doc.get(VERSION_FIELD, 0)
+
+
+def event_etag(event_doc, variant: str):
+    return f'"{event_doc["_id"]}.{version_of(event_doc)}.{variant}"'
+
+
+def listing_etag(user_email: str, variant: str, event_docs, next_cursor=None):
+    digest = hashlib.sha1(f"{user_email}|{variant}|{next_cursor or ''}".encode())
+    for event_doc in event_docs:
+        digest.update(f"|{event_doc['_id']}.{version_of(event_doc)}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def matches(if_none_match, etag: str):
+    """If-None-Match comparison (RFC 9110 uses the weak comparison here)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(etag: str, headers=None):
+    return Response(status_code=304, headers={**(headers or {}), "ETag": etag})
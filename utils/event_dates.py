@@ -0,0 +1,140 @@
+"""Typed event start times.
+
+Events keep the legacy ``date`` / ``time`` strings for display, and also store
+``starts_at`` (a naive UTC datetime, as pymongo returns them) plus the IANA
+``timezone`` the strings were written in. Sorting and pagination use
+``starts_at``; date range filters match the event's own local ``date``, so an
+event is found under the day it happens on wherever it is.
+
+Backfill existing documents in batches (safe to interrupt and re-run):
+
+    python -m utils.event_dates --batch-size 500
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import UpdateOne
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMATS = ("%H:%M", "%H:%M:%S")
+DEFAULT_TIMEZONE = "UTC"
+# How far local time can be from UTC (UTC-12 through UTC+14).
+_MAX_BEHIND_UTC = timedelta(hours=12)
+_MAX_AHEAD_OF_UTC = timedelta(hours=14)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value: str) -> date:
+    value = value.strip()
+    # strptime alone would also accept unpadded forms such as 2024-1-5.
+    if len(value) != 10:
+        raise ValueError("date must be in YYYY-MM-DD format")
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def parse_time(value: str) -> time:
+    value = value.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError("time must be in HH:MM or HH:MM:SS format")
+
+
+def resolve_timezone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone '{name}'")
+
+
+def to_starts_at(day: date, at: time, tz_name: str = DEFAULT_TIMEZONE) -> datetime:
+    local = datetime.combine(day, at).replace(tzinfo=resolve_timezone(tz_name))
+    return local.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def local_day_filter(start: date = None, end: date = None) -> dict:
+    """Query for events whose local date falls from ``start`` through ``end``.
+
+    The stored ``date`` string decides; the ``starts_at`` range around it is
+    widened by the largest UTC offsets and only lets the starts_at index narrow
+    the scan.
+    """
+    local_date, starts_at = {}, {}
+    if start:
+        local_date["$gte"] = start.isoformat()
+        starts_at["$gte"] = datetime.combine(start, time.min) - _MAX_AHEAD_OF_UTC
+    if end:
+        local_date["$lte"] = end.isoformat()
+        starts_at["$lt"] = datetime.combine(end + timedelta(days=1), time.min) + _MAX_BEHIND_UTC
+    return {"date": local_date, "starts_at": starts_at}
+
+
+def starts_at_from_strings(event_doc):
+    """Derive starts_at from a legacy document, or None if its strings don't parse."""
+    try:
+        return to_starts_at(
+            parse_date(event_doc.get("date") or ""),
+            parse_time(event_doc.get("time") or "00:00"),
+            event_doc.get("timezone") or DEFAULT_TIMEZONE
+        )
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+async def backfill_starts_at(events_collection, batch_size: int = 500):
+    """Set starts_at on every event that lacks it.
+
+    Documents whose strings can't be parsed get ``starts_at: None`` so they are
+    not picked up again. Returns (updated, unparseable).
+    """
+    updated = 0
+    unparseable = 0
+
+    while True:
+        batch = await events_collection.find(
+            {"starts_at": {"$exists": False}}, {"date": 1, "time": 1, "timezone": 1}
+        ).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+
+        operations = []
+        for event in batch:
+            starts_at = starts_at_from_strings(event)
+            if starts_at is None:
+                unparseable += 1
+            else:
+                updated += 1
+            operations.append(UpdateOne(
+                {"_id": event["_id"], "starts_at": {"$exists": False}},
+                {"$set": {"starts_at": starts_at, "timezone": event.get("timezone") or DEFAULT_TIMEZONE}}
+            ))
+
+        await events_collection.bulk_write(operations, ordered=False)
+        logger.info("Backfilled %s events so far (%s unparseable)", updated, unparseable)
+
+    return updated, unparseable
+
+
+async def _main(batch_size: int):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        updated, unparseable = await backfill_starts_at(database.events_collection, batch_size)
+        print(f"Done: {updated} events backfilled, {unparseable} left with starts_at=null")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_main(args.batch_size))
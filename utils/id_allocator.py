@@ -0,0 +1,62 @@
+"""Block allocation of integer IDs from a Mongo counter document.
+
+Instead of one ``$inc`` per new ID, each process reserves a block of
+``block_size`` IDs with a single ``$inc`` and hands them out locally. The
+counter's ``sequence_value`` is still "the highest ID handed out", so blocks
+never overlap across processes and a restart simply starts a new block (the
+unused tail of the old one is skipped). IDs stay positive integers but are
+only increasing per process, not globally.
+"""
+import asyncio
+import os
+
+from pymongo import ReturnDocument
+
+from config import get_settings
+
+
+class BlockIdAllocator:
+    def __init__(self, counter_id: str, block_size: int = None):
+        # Without an explicit size, EVENT_ID_BLOCK_SIZE is read when the first block is reserved.
+        if block_size is not None and block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.counter_id = counter_id
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._pid = os.getpid()
+        self._lock = None
+
+    async def _reserve(self, counters_collection):
+        if self.block_size is None:
+            self.block_size = get_settings().event_id_block_size
+        counter = await counters_collection.find_one_and_update(
+            {"_id": self.counter_id},
+            {"$inc": {"sequence_value": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._end = counter["sequence_value"] + 1
+        self._next = self._end - self.block_size
+
+    async def next_id(self, counters_collection):
+        if self._pid != os.getpid():
+            # A forked child must not reuse the block its parent had reserved.
+            self._pid = os.getpid()
+            self._next = self._end = 0
+            self._lock = None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._next >= self._end:
+                await self._reserve(counters_collection)
+            allocated = self._next
+            self._next += 1
+            return allocated
+
+    def remaining(self):
+        return self._end - self._next
+
+
+event_ids = BlockIdAllocator("event_id")
@@ -0,0 +1,181 @@
+"""Read-through cache for the per-user event listings (/me, /my-events, /invited).
+
+LISTING_CACHE_BACKEND selects the store:
+
+memory  (default) in-process LRU with TTL
+redis   redis.asyncio client for REDIS_URL (needs the ``redis`` package)
+off     no caching
+
+Backends only need the subset of the redis.asyncio API used here:
+``get(key)``, ``set(key, value, ex=None, nx=False)`` and ``delete(*keys)``, so a
+Redis client, MemoryCache or any fake with those methods can be plugged in with
+set_backend().
+
+Entries are stored under a per-user generation token. Invalidating a user
+deletes the token; the next read mints a fresh one, so every older entry for
+that user becomes unreachable and ages out. A request that read Mongo before
+an invalidation writes under the old token, so it can't resurrect stale data.
+
+The memory backend is per process: with several workers, a write handled by
+one worker doesn't invalidate the others, which serve their copy until
+LISTING_CACHE_TTL runs out. serve.py therefore switches it off when it
+starts more than one worker; use the redis backend there.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import get_settings
+from repositories import get_attendee_repository
+from utils import metrics
+from utils.backends import ConfiguredBackend
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "listing:"
+# Large events touch many users per write; keep each DEL a reasonable size.
+INVALIDATE_BATCH = 1000
+
+metrics.describe("listing_cache_requests_total", "counter", "Listing cache lookups by endpoint and result (hit/miss).")
+metrics.describe("listing_cache_invalidations_total", "counter", "Users whose cached listings were invalidated.")
+
+
+class MemoryCache:
+    """Bounded LRU with per-entry TTL, exposing the redis.asyncio methods the cache uses."""
+
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize if maxsize is not None else get_settings().listing_cache_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and key in self._entries:
+                _, expires_at = self._entries[key]
+                if expires_at is None or expires_at > time.monotonic():
+                    return None
+            self._entries[key] = (value, time.monotonic() + ex if ex else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    async def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._entries.pop(key, None) is not None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Built from the settings on first use.
+_backend = ConfiguredBackend("listing_cache_backend", MemoryCache)
+
+
+def set_backend(backend):
+    """Swap the store (e.g. for a fake in tests). None disables caching."""
+    _backend.set(backend)
+
+
+def enabled():
+    return _backend.get() is not None
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _generation_key(email: str):
+    return f"{KEY_PREFIX}gen:{email}"
+
+
+async def _generation(email: str):
+    # Tokens expire too, so idle users don't keep one around forever.
+    backend = _backend.get()
+    key = _generation_key(email)
+    generation = await backend.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not await backend.set(key, generation, ex=get_settings().listing_cache_ttl * 2, nx=True):
+            generation = await backend.get(key) or generation
+    return _text(generation)
+
+
+async def lookup(email: str, endpoint: str, variant: str):
+    """Return (cache_key, cached) where cached is (body bytes, next_cursor, etag) or None.
+
+    If the store is unreachable the key is None as well, and the caller just
+    queries Mongo without caching.
+    """
+    try:
+        key = f"{KEY_PREFIX}{await _generation(email)}:{endpoint}:{variant}"
+        value = await _backend.get().get(key)
+    except Exception as e:
+        logger.error("Listing cache lookup failed: %s", e)
+        return None, None
+    if value is None:
+        metrics.inc("listing_cache_requests_total", endpoint=endpoint, result="miss")
+        return key, None
+    metrics.inc("listing_cache_requests_total", endpoint=endpoint, result="hit")
+    if isinstance(value, str):
+        value = value.encode()
+    next_cursor, etag, body = value.split(b"\n", 2)
+    return key, (body, next_cursor.decode() or None, etag.decode())
+
+
+async def store(key: str, body: bytes, next_cursor, etag: str):
+    try:
+        await _backend.get().set(key, f"{next_cursor or ''}\n{etag}\n".encode() + body,
+                                 ex=get_settings().listing_cache_ttl)
+    except Exception as e:
+        logger.error("Listing cache store failed: %s", e)
+
+
+async def invalidate(emails):
+    """Drop every cached listing of the given users.
+
+    Called after the write has been stored, so a cache failure is logged rather
+    than failing the request; affected entries then expire with their TTL.
+    """
+    backend = _backend.get()
+    if backend is None:
+        return
+    keys = [_generation_key(email) for email in set(emails) if email]
+    try:
+        for start in range(0, len(keys), INVALIDATE_BATCH):
+            await backend.delete(*keys[start:start + INVALIDATE_BATCH])
+    except Exception as e:
+        logger.error("Error invalidating listing cache for %s users: %s", len(keys), e)
+        return
+    metrics.inc("listing_cache_invalidations_total", len(keys))
+
+
+async def event_members(event_id: int):
+    """Members whose listings include the event; empty when caching is off, to skip the lookup."""
+    if _backend.get() is None:
+        return []
+    return await get_attendee_repository().member_emails(event_id)
+
+
+async def invalidate_event(event_id: int):
+    """Invalidate everyone who belongs to the event: any change to it shows up in all their listings."""
+    try:
+        members = await event_members(event_id)
+    except Exception as e:
+        logger.error("Error loading members of event %s for cache invalidation: %s", event_id, e)
+        return
+    await invalidate(members)
@@ -0,0 +1,114 @@
+"""Structured, non-blocking logging for the API.
+
+Records are formatted as one JSON object per line and written by a
+QueueListener thread, so request handlers only pay for putting a record on a
+queue. Configuration comes from the environment:
+
+LOG_LEVEL               root level (default INFO)
+LOG_INFO_SAMPLE_RATE    fraction of below-WARNING records kept while handling a request (default 1.0)
+LOG_SAMPLE_RATES        per-route overrides keyed by route template, as in the metrics labels,
+                        e.g. "/events/search=0.05,/events/{event_id}/attendees=0.2"
+
+Records logged while handling a request carry its route template as ``route``.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from datetime import datetime, timezone
+
+from config import get_settings
+from utils.metrics import current_route
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route is not None:
+            entry["route"] = route
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RouteFilter(logging.Filter):
+    """Attaches the route template of the request being handled, or None, as ``record.route``.
+
+    Runs in the logging thread, before the record is queued, so the request is still current.
+    """
+
+    def filter(self, record):
+        record.route = current_route()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every WARNING and above, and a configurable fraction of lower-level request records."""
+
+    def __init__(self, default_rate: float, rates: dict):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = rates
+
+    def _rate_for(self, route):
+        if route is None:
+            return 1.0
+        return self.rates.get(route, self.default_rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(getattr(record, "route", None))
+        return rate >= 1.0 or random.random() < rate
+
+
+def _parse_rates(raw: str):
+    rates = {}
+    for item in raw.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging():
+    """Route all logging through a background writer. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    settings = get_settings()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RouteFilter())
+    queue_handler.addFilter(SamplingFilter(
+        settings.log_info_sample_rate,
+        _parse_rates(settings.log_sample_rates)
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.log_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,208 @@
+"""In-process request and MongoDB metrics, exported in Prometheus text format.
+
+``MetricsMiddleware`` times every request and tracks in-flight requests. The
+Mongo ``CommandListener`` charges each command to the request that issued it
+through a context variable; Motor copies the context into its executor
+threads, so this works across the driver's thread hop.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_help = {}
+
+
+def route_of(scope):
+    """Route template for labels, e.g. /events/{event_id}/attendees, so ids don't explode cardinality.
+
+    Requests answered before routing are labelled by the rate-limit route class
+    they were charged to (e.g. "class:search"), or "unmatched".
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        route_class = scope.get("route_class")
+        return f"class:{route_class}" if route_class else "unmatched"
+    # Some FastAPI versions report an included route's path without the
+    # router's (static) prefix; take the prefix from the request path.
+    path = scope.get("path", "")
+    depth = path.count("/") - template.count("/")
+    if depth > 0:
+        template = "/".join(path.split("/")[:depth + 1]) + template
+    return template
+
+
+class _RequestStats:
+    __slots__ = ("scope", "commands", "seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.commands = 0
+        self.seconds = 0.0
+
+
+_current_request = contextvars.ContextVar("metrics_current_request", default=None)
+
+
+def current_route():
+    """route_of() for the request being handled in this context, or None outside requests."""
+    stats = _current_request.get()
+    return None if stats is None else route_of(stats.scope)
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def describe(name: str, kind: str, text: str):
+    _help[name] = (kind, text)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + amount
+
+
+def add_gauge(name: str, amount: float, **labels):
+    with _lock:
+        series = _gauges.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + amount
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        index = bisect.bisect_left(entry["buckets"], value)
+        if index < len(entry["counts"]):
+            entry["counts"][index] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + escaped + "}"
+
+
+def render():
+    lines = []
+    with _lock:
+        for kind, store in (("counter", _counters), ("gauge", _gauges)):
+            for name, series in sorted(store.items()):
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name][1]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(_histograms.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name][1]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, entry in series.items():
+                cumulative = 0
+                for bound, count in zip(entry["buckets"], entry["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {entry['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {entry['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+describe("http_requests_total", "counter", "HTTP requests by method, route and status.")
+describe("http_request_duration_seconds", "histogram", "HTTP request latency by method and route.")
+describe("http_requests_in_flight", "gauge", "HTTP requests currently being handled.")
+describe("mongo_commands_total", "counter", "MongoDB commands by command name and originating route.")
+describe("mongo_command_failures_total", "counter", "Failed MongoDB commands by command name.")
+describe("mongo_command_duration_seconds", "histogram", "MongoDB command latency by command name.")
+describe("mongo_commands_per_request", "histogram", "MongoDB commands issued per HTTP request.")
+describe("mongo_seconds_per_request", "histogram", "Time spent in MongoDB per HTTP request.")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        stats = _RequestStats(scope)
+        token = _current_request.set(stats)
+        add_gauge("http_requests_in_flight", 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            add_gauge("http_requests_in_flight", -1)
+            _current_request.reset(token)
+
+            route = route_of(scope)
+            method = scope["method"]
+            inc("http_requests_total", method=method, route=route, status=status["code"])
+            observe("http_request_duration_seconds", elapsed, method=method, route=route)
+            observe("mongo_commands_per_request", stats.commands, COUNT_BUCKETS, route=route)
+            observe("mongo_seconds_per_request", stats.seconds, route=route)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def _record(self, event, failed: bool):
+        seconds = event.duration_micros / 1e6
+        stats = _current_request.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.seconds += seconds
+        # The router has filled in scope["route"] by the time a handler talks to Mongo.
+        route = "background" if stats is None else route_of(stats.scope)
+        inc("mongo_commands_total", command=event.command_name, route=route)
+        observe("mongo_command_duration_seconds", seconds, command=event.command_name)
+        if failed:
+            inc("mongo_command_failures_total", command=event.command_name)
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+
+command_listener = MongoCommandMetrics()
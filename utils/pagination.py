@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Keyset order for listings: by start time, with _id breaking ties between events
+# that start at the same moment.
+PAGE_SORT = [("starts_at", ASCENDING), ("_id", ASCENDING)]
+
+# Event fields returned in "summary" mode. The attendees array is replaced by an
+# $elemMatch projection so Mongo sends back only the caller's own entry.
+SUMMARY_FIELDS = ["title", "description", "date", "time", "starts_at", "timezone", "location", "organizer", "created_at", "version"]
+
+
+def encode_cursor(event_doc):
+    starts_at = event_doc.get("starts_at")
+    event_id = event_doc["_id"] if "_id" in event_doc else event_doc.get("id")
+    raw = json.dumps({"starts_at": starts_at.isoformat() if starts_at else None, "id": event_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        starts_at = datetime.fromisoformat(data["starts_at"]) if data["starts_at"] else None
+        return starts_at, data["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def apply_cursor(query: dict, token: str):
+    last_starts_at, last_id = decode_cursor(token)
+    if last_starts_at is None:
+        # Events whose start time couldn't be backfilled sort first, as null.
+        after = {
+            "$or": [
+                {"starts_at": None, "_id": {"$gt": last_id}},
+                {"starts_at": {"$ne": None}}
+            ]
+        }
+    else:
+        after = {
+            "$or": [
+                {"starts_at": {"$gt": last_starts_at}},
+                {"starts_at": last_starts_at, "_id": {"$gt": last_id}}
+            ]
+        }
+    return {"$and": [query, after]} if query else after
+
+
+def summary_projection(user_email: str):
+    projection = {field: 1 for field in SUMMARY_FIELDS}
+    projection["attendees"] = {"$elemMatch": {"email": user_email}}
+    return projection
+
+
+async def fetch_page(collection, query: dict, limit, cursor, projection=None, sort=None):
+    """Return (documents, next_cursor).
+
+    Without limit/cursor the full result is returned, ordered by ``sort`` if given
+    and by start time otherwise. Paginated results always use the PAGE_SORT keyset.
+    """
+    if limit is None and cursor is None:
+        found = collection.find(query, projection).sort(sort or PAGE_SORT)
+        return await found.to_list(length=None), None
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    if cursor:
+        query = apply_cursor(query, cursor)
+
+    docs = await collection.find(query, projection).sort(PAGE_SORT).limit(page_size + 1).to_list(length=None)
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+
+def aggregate_pipeline(query: dict, stages, sort=None, limit=None):
+    pipeline = [{"$match": query}, {"$sort": dict(sort or PAGE_SORT)}]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline + list(stages)
+
+
+async def aggregate_page(collection, query: dict, limit, cursor, stages, sort=None):
+    """fetch_page for aggregations: $match, $sort and $limit run first, then ``stages``
+    shape only the documents on the page. Returns (documents, next_cursor)."""
+    if limit is None and cursor is None:
+        pipeline = aggregate_pipeline(query, stages, sort)
+        return await collection.aggregate(pipeline).to_list(length=None), None
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    if cursor:
+        query = apply_cursor(query, cursor)
+
+    pipeline = aggregate_pipeline(query, stages, limit=page_size + 1)
+    docs = await collection.aggregate(pipeline).to_list(length=None)
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
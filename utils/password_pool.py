@@ -0,0 +1,117 @@
+import asyncio
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+
+from config import get_settings
+import utils.auth_utils as auth_utils
+
+_executor = None
+_pending = 0
+_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "queue_wait_seconds_total": 0.0,
+    "queue_wait_seconds_max": 0.0,
+    "hash_seconds_total": 0.0,
+    "hash_seconds_max": 0.0,
+}
+
+
+def _run_timed(operation: str, submitted_at: float, *args):
+    started_at = time.time()
+    if operation == "hash":
+        result = auth_utils.hash_password(*args)
+    else:
+        result = auth_utils.verify_password(*args)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+def _warm():
+    # Loads passlib and its bcrypt backend, which the first hash would otherwise wait for.
+    auth_utils.pwd_context().handler().get_backend()
+
+
+def _mp_context():
+    # By the time the pool starts, this process runs the AnyIO threadpool and
+    # Motor's threads; forking it could copy a lock another thread holds, so
+    # pool processes come from a forkserver (or are spawned where there is none).
+    # Like spawn, that re-imports the main script, so entry points need the
+    # usual ``if __name__ == "__main__":`` guard.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=get_settings().password_pool_size, mp_context=_mp_context())
+    return _executor
+
+
+async def start():
+    """Start the pool processes now, so the first login or signup doesn't wait for them."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, _warm) for _ in range(get_settings().password_pool_size)))
+
+
+def _retry_after():
+    if _stats["completed"] == 0:
+        return 1
+    avg_hash = _stats["hash_seconds_total"] / _stats["completed"]
+    return max(1, math.ceil(_pending / get_settings().password_pool_size * avg_hash))
+
+
+async def _submit(operation: str, *args):
+    global _pending
+    if _pending >= get_settings().password_queue_limit:
+        _stats["rejected"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many authentication requests. Please retry shortly.",
+            headers={"Retry-After": str(_retry_after())}
+        )
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, queue_wait, hash_time = await loop.run_in_executor(
+            _get_executor(), _run_timed, operation, time.time(), *args
+        )
+    finally:
+        _pending -= 1
+
+    _stats["completed"] += 1
+    _stats["queue_wait_seconds_total"] += queue_wait
+    _stats["queue_wait_seconds_max"] = max(_stats["queue_wait_seconds_max"], queue_wait)
+    _stats["hash_seconds_total"] += hash_time
+    _stats["hash_seconds_max"] = max(_stats["hash_seconds_max"], hash_time)
+    return result
+
+
+async def hash_password(password: str):
+    return await _submit("hash", password)
+
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await _submit("verify", plain_password, hashed_password)
+
+
+def stats():
+    return {
+        **_stats,
+        "pool_size": get_settings().password_pool_size,
+        "queue_limit": get_settings().password_queue_limit,
+        "in_flight": _pending,
+    }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,292 @@
+"""Rate limiting and admission control for the API.
+
+``RateLimitMiddleware`` sorts every request into a route class and, before it
+reaches a handler (and Mongo), checks:
+
+1. the class's concurrency cap in this process: when full, 503 right away;
+2. for requests carrying a valid bearer token, a token bucket for the user,
+   then one for the client IP: when empty, 429 with Retry-After. The token's
+   check is left on the request, so the route doesn't decode it again.
+
+Route classes: ``login`` (signup and login), ``search``, ``attendees``
+(GET /events/{id}/attendees), ``feed`` (the long-lived /events/feed
+connections; its buckets limit reconnects) and ``default``. /metrics, the docs
+and CORS preflights are never limited. Budgets are "rate/burst" in requests per second
+and can be overridden per class, e.g.
+RATE_LIMITS_USER="search=1/5,default=10/20", RATE_LIMITS_IP="login=0.5/5" and
+CONCURRENCY_LIMITS="search=8". A rate or cap of 0 disables that bucket or cap.
+
+RATE_LIMIT_BACKEND selects where buckets live:
+
+memory  (default) per-process buckets. Each process gets 1/RATE_LIMIT_PROCESSES
+        of every budget (serve.py sets it to the worker count), which is
+        only as even as the kernel's spread of connections over workers
+redis   shared buckets in REDIS_URL (needs the ``redis`` package), so the
+        budget holds across workers
+off     no rate limiting (concurrency caps still apply)
+
+A store only needs ``take(key, rate, burst)`` returning (allowed, retry_after
+seconds), so MemoryBucketStore, RedisBucketStore or any fake can be plugged in
+with set_store(). If the store fails, requests are let through.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import orjson
+
+from config import get_settings
+from utils import metrics
+from utils.backends import ConfiguredBackend
+from utils.dependencies import authenticate_scope
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+
+DEFAULT_USER_LIMITS = {
+    "default": (20, 40), "search": (2, 10), "attendees": (5, 10), "login": (0.2, 5), "feed": (0.2, 5)
+}
+DEFAULT_IP_LIMITS = {
+    "default": (50, 100), "search": (5, 20), "attendees": (10, 20), "login": (1, 10), "feed": (1, 20)
+}
+DEFAULT_CONCURRENCY_LIMITS = {"default": 256, "search": 16, "attendees": 16, "login": 32, "feed": 5000}
+
+EXEMPT_PATHS = ("/metrics", "/docs", "/redoc", "/openapi.json")
+_ATTENDEES_PATH = re.compile(r"^/events/[^/]+/attendees/?$")
+
+metrics.describe("rate_limit_rejections_total", "counter",
+                 "Requests rejected before reaching a handler, by route class and reason (user, ip, concurrency).")
+metrics.describe("admission_in_flight", "gauge", "Requests holding a concurrency slot, by route class.")
+
+
+def route_class(method: str, path: str):
+    """The budget a request is charged to, or None if it is never limited."""
+    if method == "OPTIONS" or path in EXEMPT_PATHS:
+        return None
+    if path in ("/auth/login", "/auth/signup"):
+        return "login"
+    if path.rstrip("/") == "/events/search":
+        return "search"
+    if path.rstrip("/") == "/events/feed":
+        return "feed"
+    if method == "GET" and _ATTENDEES_PATH.match(path):
+        return "attendees"
+    return "default"
+
+
+def _parse_limits(raw: str, defaults: dict):
+    limits = dict(defaults)
+    for item in raw.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            rate, _, burst = value.partition("/")
+            limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+def _parse_caps(raw: str, defaults: dict):
+    caps = dict(defaults)
+    for item in raw.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            caps[name.strip()] = int(value)
+    return caps
+
+
+def _share(limits: dict, processes: int):
+    return {name: (rate / processes, max(1.0, burst / processes)) for name, (rate, burst) in limits.items()}
+
+
+@lru_cache(maxsize=None)
+def _policy():
+    settings = get_settings()
+    user_limits = _parse_limits(settings.rate_limits_user, DEFAULT_USER_LIMITS)
+    ip_limits = _parse_limits(settings.rate_limits_ip, DEFAULT_IP_LIMITS)
+    if settings.rate_limit_backend == "memory" and settings.rate_limit_processes > 1:
+        user_limits = _share(user_limits, settings.rate_limit_processes)
+        ip_limits = _share(ip_limits, settings.rate_limit_processes)
+    return user_limits, ip_limits, _parse_caps(settings.concurrency_limits, DEFAULT_CONCURRENCY_LIMITS)
+
+
+class MemoryBucketStore:
+    """Token buckets in a bounded LRU; idle buckets are the first to go."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: float):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Refill and take in one round trip; Redis' clock is used so workers agree on time.
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisBucketStore:
+    def __init__(self, client):
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float):
+        allowed, retry_after = await self._take(keys=[key], args=[rate, burst])
+        return bool(allowed), float(retry_after)
+
+
+# Built from the settings on first use.
+_store = ConfiguredBackend("rate_limit_backend", MemoryBucketStore, RedisBucketStore)
+
+
+def set_store(store):
+    """Swap the bucket store (e.g. for a fake in tests). None disables the buckets."""
+    _store.set(store)
+
+
+_in_flight = {}
+
+
+def in_flight(route_class_name: str):
+    return _in_flight.get(route_class_name, 0)
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers") or ():
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _user_of(scope):
+    authorization = _header(scope, b"authorization")
+    if not authorization:
+        return None
+    try:
+        # Verified tokens are cached, so this is a dict lookup after the first request;
+        # the route's get_current_user reuses the outcome instead of decoding again.
+        return authenticate_scope(scope, authorization)
+    except Exception:
+        # Let the route reject it; until then the request only counts against its IP.
+        return None
+
+
+async def _check_buckets(scope, name: str):
+    """Return (reason, retry_after) for the first exhausted bucket, or None."""
+    store = _store.get()
+    if store is None:
+        return None
+    user_limits, ip_limits, _ = _policy()
+    # The user's bucket goes first, so a request over its user budget doesn't also
+    # spend the budget shared by everyone behind the same IP.
+    checks = []
+    user = _user_of(scope)
+    if user:
+        checks.append(("user", user, user_limits.get(name, user_limits["default"])))
+    client = scope.get("client")
+    if client:
+        checks.append(("ip", client[0], ip_limits.get(name, ip_limits["default"])))
+
+    for reason, identity, (rate, burst) in checks:
+        if rate <= 0:
+            continue
+        try:
+            allowed, retry_after = await store.take(f"{KEY_PREFIX}{name}:{reason}:{identity}", rate, burst)
+        except Exception as e:
+            logger.error("Rate limit store failed, letting the request through: %s", e)
+            return None
+        if not allowed:
+            return reason, retry_after
+    return None
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        caps = _policy()[2]
+        cap = caps.get(name, caps["default"])
+        if 0 < cap <= _in_flight.get(name, 0):
+            metrics.inc("rate_limit_rejections_total", route_class=name, reason="concurrency")
+            # Rejections never reach the router; this labels them in the request metrics.
+            scope["route_class"] = name
+            await _reject(send, 503, "Server is busy. Please retry shortly.", 1)
+            return
+
+        # Holding the slot while the buckets are checked keeps a burst from all passing the cap check at once.
+        _in_flight[name] = _in_flight.get(name, 0) + 1
+        metrics.add_gauge("admission_in_flight", 1, route_class=name)
+        try:
+            limited = await _check_buckets(scope, name)
+            if limited is not None:
+                reason, retry_after = limited
+                metrics.inc("rate_limit_rejections_total", route_class=name, reason=reason)
+                scope["route_class"] = name
+                await _reject(send, 429, "Too many requests. Please retry shortly.", retry_after)
+                return
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight[name] -= 1
+            metrics.add_gauge("admission_in_flight", -1, route_class=name)
@@ -0,0 +1,118 @@
+"""Per-event RSVP counters stored on the event document as ``response_counts``.
+
+The counters are kept up to date by the invite and respond writes, so the
+attendees summary can be read without walking the attendee list. Events created
+before the counters existed have none (or, after an older write, only some);
+writes to them recount instead of moving the counters, and reads fall back to
+counting the attendee list. ``repair_response_counts`` recomputes every event's
+counters to fix any drift:
+
+    python -m utils.response_counts
+"""
+import asyncio
+
+NO_RESPONSE = "No Response"
+RESPONSE_KEYS = ["Going", "Maybe", "Not Going", NO_RESPONSE]
+
+
+def initial_counts(attendee_count: int = 0):
+    counts = {key: 0 for key in RESPONSE_KEYS}
+    counts[NO_RESPONSE] = attendee_count
+    return counts
+
+
+def count_responses(attendees):
+    counts = initial_counts()
+    for attendee in attendees:
+        response = attendee.get("response", NO_RESPONSE)
+        if response in counts:
+            counts[response] += 1
+    return counts
+
+
+def counts_complete(counts):
+    """Whether stored counters can be served: every key present and none negative."""
+    return isinstance(counts, dict) and all(
+        isinstance(counts.get(key), (int, float)) and counts[key] >= 0 for key in RESPONSE_KEYS
+    )
+
+
+# Query filter for events whose counters can be moved with $inc.
+COUNTERS_PRESENT = {f"response_counts.{key}": {"$type": "number"} for key in RESPONSE_KEYS}
+
+
+def counter_field(response):
+    return f"response_counts.{response or NO_RESPONSE}"
+
+
+def response_inc(previous, response):
+    """$inc for an RSVP moving from ``previous`` to ``response``: bumps the event's
+    version (for ETags) and, if the answer changed, moves the counters."""
+    inc = {"version": 1}
+    if (previous or NO_RESPONSE) != response:
+        inc[counter_field(previous)] = -1
+        inc[counter_field(response)] = 1
+    return inc
+
+
+def _count_expression(response: str):
+    return {
+        "$size": {
+            "$filter": {
+                "input": {"$ifNull": ["$attendees", []]},
+                "cond": {"$eq": [{"$ifNull": ["$$this.response", NO_RESPONSE]}, response]}
+            }
+        }
+    }
+
+
+def counts_after(deltas: dict):
+    """Pipeline-update expression for ``response_counts`` after a change to the
+    embedded ``attendees``: the stored counters moved by ``deltas`` ({key:
+    number or expression}), or a recount of the updated array if any counter
+    is missing."""
+    return {"$cond": [
+        {"$and": [{"$isNumber": f"$response_counts.{key}"} for key in RESPONSE_KEYS]},
+        {key: {"$add": [f"$response_counts.{key}", deltas.get(key, 0)]} for key in RESPONSE_KEYS},
+        {key: _count_expression(key) for key in RESPONSE_KEYS},
+    ]}
+
+
+async def repair_response_counts(events_collection, event_id=None):
+    """Recompute counters server-side with a pipeline update; returns the number of events changed.
+
+    Only events whose counters actually drifted get their version bumped, so a
+    repair run doesn't invalidate every ETag.
+    """
+    query = {} if event_id is None else {"_id": event_id}
+    result = await events_collection.update_many(
+        query,
+        [
+            {"$set": {"_repaired_counts": {key: _count_expression(key) for key in RESPONSE_KEYS}}},
+            {"$set": {
+                "version": {"$cond": [
+                    {"$eq": ["$response_counts", "$_repaired_counts"]},
+                    "$version",
+                    {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+                ]},
+                "response_counts": "$_repaired_counts"
+            }},
+            {"$project": {"_repaired_counts": 0}}
+        ]
+    )
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    import database
+    from repositories import get_attendee_repository
+
+    async def _main():
+        await database.connect_to_mongo()
+        try:
+            changed = await get_attendee_repository().repair_response_counts()
+            print(f"Repaired response counters on {changed} events")
+        finally:
+            database.close_mongo_connection()
+
+    asyncio.run(_main())
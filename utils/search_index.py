@@ -0,0 +1,145 @@
+"""Keyword search backends for /events/search.
+
+SEARCH_BACKEND selects how the keyword filter is built:
+
+text    (default) MongoDB $text query on the title/description text index, ranked by textScore
+memory  in-process inverted index with prefix matching, ranked by weighted term hits
+regex   the original unanchored case-insensitive $regex (no index support)
+
+The in-memory index is rebuilt from the events collection at startup and updated
+on create/delete by the process that handles them, so with several workers
+each one would only see its own writes until its next restart. It is meant for
+single-worker deployments; serve.py switches to ``text`` when running more.
+
+The memory backend hands its matches to Mongo as an ``_id`` list, so a keyword
+matching more than MAX_CANDIDATES events only searches the best-scoring ones.
+"""
+import bisect
+import heapq
+import re
+
+from config import get_settings
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+_TOKEN = re.compile(r"\w+")
+# Ids sent in one $in; 10k ids is ~150 KB of BSON, well under the 16 MB limit.
+MAX_CANDIDATES = 10_000
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+class InvertedIndex:
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._event_tokens = {}
+
+    def __len__(self):
+        return len(self._event_tokens)
+
+    def add(self, event_id, title, description):
+        self.remove(event_id)
+        weights = {}
+        for token in tokenize(title):
+            weights[token] = weights.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+            postings[event_id] = weight
+        self._event_tokens[event_id] = list(weights)
+
+    def remove(self, event_id):
+        for token in self._event_tokens.pop(event_id, []):
+            postings = self._postings[token]
+            postings.pop(event_id, None)
+            if not postings:
+                del self._postings[token]
+                self._tokens.pop(bisect.bisect_left(self._tokens, token))
+
+    def _prefix_scores(self, term):
+        scores = {}
+        start = bisect.bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            for event_id, weight in self._postings[token].items():
+                scores[event_id] = scores.get(event_id, 0) + weight
+        return scores
+
+    def search(self, text):
+        """Return {event_id: score} for events matching every term as a word prefix."""
+        result = None
+        for term in set(tokenize(text)):
+            scores = self._prefix_scores(term)
+            if result is None:
+                result = scores
+            else:
+                result = {eid: result[eid] + s for eid, s in scores.items() if eid in result}
+            if not result:
+                return {}
+        return result or {}
+
+    async def rebuild(self, events_collection):
+        self._postings.clear()
+        self._tokens.clear()
+        self._event_tokens.clear()
+        async for ev in events_collection.find({}, {"title": 1, "description": 1}):
+            self.add(ev["_id"], ev.get("title"), ev.get("description"))
+
+
+event_index = InvertedIndex()
+
+
+def index_event(event_id, title, description):
+    if get_settings().search_backend == "memory":
+        event_index.add(event_id, title, description)
+
+
+def unindex_event(event_id):
+    if get_settings().search_backend == "memory":
+        event_index.remove(event_id)
+
+
+def keyword_filter(keyword: str):
+    """Build the keyword part of a search.
+
+    Returns (query fragment, extra projection, sort, scores). ``scores`` is only set
+    by the memory backend, which ranks in Python after the fetch.
+    """
+    backend = get_settings().search_backend
+    if backend == "text":
+        return (
+            {"$text": {"$search": keyword}},
+            {"score": {"$meta": "textScore"}},
+            [("score", {"$meta": "textScore"})],
+            None
+        )
+
+    if backend == "memory":
+        scores = event_index.search(keyword)
+        if len(scores) > MAX_CANDIDATES:
+            best = heapq.nlargest(MAX_CANDIDATES, scores, key=scores.get)
+            scores = {event_id: scores[event_id] for event_id in best}
+        return {"_id": {"$in": list(scores)}}, None, None, scores
+
+    escaped_keyword = re.escape(keyword)
+    return (
+        {
+            "$or": [
+                {"title": {"$regex": escaped_keyword, "$options": "i"}},
+                {"description": {"$regex": escaped_keyword, "$options": "i"}}
+            ]
+        },
+        None,
+        None,
+        None
+    )
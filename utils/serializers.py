@@ -0,0 +1,119 @@
+"""Event serialization shared by the event, search and streaming paths.
+
+``serialize_event`` builds the response dict in one pass over the document and
+at most one pass over ``attendees``, without copying or mutating the attendee
+entries (only the caller's own entry is replaced by a copy carrying
+``my_response``). ``dumps`` encodes with orjson, which handles datetimes
+natively; routes that return large lists hand the bytes straight to
+``ORJSONResponse`` so FastAPI's jsonable_encoder walk is skipped.
+
+``viewer_stages`` is the aggregation-pipeline counterpart of serialize_event,
+for queries that let Mongo shape the documents (see /events/search).
+"""
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.pagination import SUMMARY_FIELDS
+
+ATTENDEE_FIELDS = ("email", "role", "response", "response_updated_at")
+
+
+def _default(value):
+    # Anything orjson doesn't know (e.g. ObjectId) goes through FastAPI's encoder.
+    return jsonable_encoder(value)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _viewer_entry(attendees, user_email: str):
+    for index, attendee in enumerate(attendees):
+        if attendee.get("email") == user_email:
+            return index, attendee
+    return -1, None
+
+
+def serialize_event(event_doc, user_email: str, fields: str = "full"):
+    """Shape an event for the API, adding the caller's role and response.
+
+    ``fields="summary"`` leaves out the attendees array.
+    """
+    serialized = {}
+    attendees = None
+    for key, value in event_doc.items():
+        if key == "_id":
+            serialized["id"] = value
+        elif key == "attendees":
+            attendees = value
+        else:
+            serialized[key] = value
+    if "id" not in serialized:
+        serialized["id"] = event_doc.get("event_id")
+
+    is_organizer = event_doc.get("organizer") == user_email
+    index, entry = _viewer_entry(attendees, user_email) if attendees else (-1, None)
+
+    user_role = "attendee"
+    user_response = None
+    if is_organizer:
+        user_role = "organizer"
+    elif entry is not None:
+        user_role = entry.get("role", "attendee")
+        user_response = entry.get("response")
+
+    if attendees is not None and fields != "summary":
+        if entry is not None:
+            attendees = attendees[:]
+            attendees[index] = {**entry, "my_response": entry.get("response")}
+        serialized["attendees"] = attendees
+
+    serialized["user_role"] = user_role
+    serialized["is_organizer"] = is_organizer
+    serialized["user_response"] = user_response
+    return serialized
+
+
+def viewer_stages(user_email: str, fields: str = "full", extra_fields=None):
+    """Pipeline stages producing what serialize_event returns, computed in Mongo.
+
+    Expects ``attendees`` to hold (at least) the viewer's entry. Unlike
+    serialize_event, the full variant keeps only that entry, so the rest of the
+    attendee array is never sent over the wire.
+    """
+    is_organizer = {"$eq": ["$organizer", user_email]}
+    stages = [
+        {"$set": {
+            "attendees": {"$filter": {
+                "input": {"$ifNull": ["$attendees", []]},
+                "cond": {"$eq": ["$$this.email", user_email]}
+            }},
+            **(extra_fields or {})
+        }},
+        {"$set": {"_viewer": {"$first": "$attendees"}}},
+        {"$set": {
+            "id": "$_id",
+            "user_role": {"$cond": [is_organizer, "organizer", {"$ifNull": ["$_viewer.role", "attendee"]}]},
+            "is_organizer": is_organizer,
+            "user_response": {"$cond": [is_organizer, None, {"$ifNull": ["$_viewer.response", None]}]}
+        }}
+    ]
+    if fields == "summary":
+        kept = [*SUMMARY_FIELDS, "id", "user_role", "is_organizer", "user_response", *(extra_fields or {})]
+        stages.append({"$project": {"_id": 0, **{field: 1 for field in kept}}})
+    else:
+        stages.append({"$set": {"attendees": {"$map": {
+            "input": "$attendees",
+            "in": {
+                **{field: f"$$this.{field}" for field in ATTENDEE_FIELDS},
+                "my_response": {"$ifNull": ["$$this.response", None]}
+            }
+        }}}})
+        stages.append({"$project": {"_id": 0, "_viewer": 0}})
+    return stages
@@ -0,0 +1,52 @@
+import logging
+from typing import Optional
+
+from fastapi.responses import StreamingResponse
+
+from utils.serializers import dumps
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson(accept: Optional[str]):
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+def ndjson_response(cursor, serialize, prepare_batch=None):
+    """Stream a Mongo cursor as one JSON document per line.
+
+    Documents are serialized as they arrive in batches of STREAM_BATCH_SIZE, so
+    memory stays flat regardless of how many events match. ``prepare_batch`` is
+    awaited on each batch before serialization (e.g. to attach related data).
+    """
+    async def flush(batch):
+        if prepare_batch is not None:
+            batch = await prepare_batch(batch)
+        return b"".join(dumps(serialize(doc)) + b"\n" for doc in batch)
+
+    async def lines():
+        try:
+            batch = []
+            async for doc in cursor.batch_size(STREAM_BATCH_SIZE):
+                batch.append(doc)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield await flush(batch)
+                    batch = []
+            if batch:
+                yield await flush(batch)
+        except Exception as e:
+            # Headers are already sent at this point, so the only option is to end the stream.
+            logger.error("Error while streaming events: %s", e)
+        finally:
+            await cursor.close()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def sse_message(event: str, data) -> bytes:
+    """One server-sent event; ``data`` is sent as JSON on a single line."""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"